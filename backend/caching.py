@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+# Caches
+class TTLCache:
+    """Size-bounded LRU with per-entry expiry, shared by request handlers and threadpool deps.
+    With maxbytes, entries are also bounded by their total len(); larger values are not cached."""
+    
+    def __init__(self, name: str, maxsize: int, ttl: float, maxbytes: Optional[int] = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Any, asyncio.Future] = {}
+        # Bumped on invalidation so loads that started earlier do not store stale results
+        self._generation = 0
+        CACHES[name] = self
+    
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+        size = self.sizeof(value) if self.maxbytes is not None else 0
+        with self._lock:
+            self._discard(key)
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+            self._entries[key] = (value, expires_at, size)
+            self.nbytes += size
+            while len(self._entries) > self.maxsize or (self.maxbytes is not None and self.nbytes > self.maxbytes):
+                self.nbytes -= self._entries.popitem(last=False)[1][2]
+    
+    @staticmethod
+    def sizeof(value: Any) -> int:
+        # Cached values are bytes or tuples holding them, e.g. (body, next_cursor)
+        if isinstance(value, tuple):
+            return sum(len(part) for part in value if part)
+        return len(value)
+    
+    def _discard(self, key: Any):
+        # Caller holds the lock
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[2]
+    
+    async def get_or_load(self, key: Any, load) -> Any:
+        # Single flight: concurrent misses for the same key share one load() call
+        value = self.get(key)
+        if value is not None:
+            return value
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(in_flight)
+        
+        generation = self._generation
+        task = asyncio.ensure_future(load())
+        self._in_flight[key] = task
+        try:
+            value = await asyncio.shield(task)
+        finally:
+            if self._in_flight.get(key) is task:
+                del self._in_flight[key]
+        if generation == self._generation:
+            self.set(key, value)
+        return value
+    
+    def invalidate(self, key: Any):
+        with self._lock:
+            self._discard(key)
+            self._generation += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self._generation += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+CACHES: Dict[str, TTLCache] = {}
@@ -0,0 +1,274 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import List, Optional, Dict, Any
+from pymongo import monitoring
+from starlette.routing import Match
+
+# Metrics, exposed at /metrics in Prometheus text format
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+class Metric:
+    kind = "untyped"
+    
+    def __init__(self, name: str, help_text: str, labelnames: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        # Motor runs command listeners on its I/O threads, so writes are locked
+        self._lock = threading.Lock()
+        METRICS.append(self)
+    
+    def _labels(self, values: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+    
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+class Counter(Metric):
+    kind = "counter"
+    
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        super().__init__(name, help_text, labelnames)
+        self.values: Dict[tuple, float] = {}
+    
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+    
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._labels(labels)} {value}" for labels, value in list(self.values.items())]
+
+class Gauge(Counter):
+    kind = "gauge"
+    
+    def dec(self, labels: tuple = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+class Histogram(Metric):
+    kind = "histogram"
+    
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = buckets
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self.values: Dict[tuple, list] = {}
+    
+    def observe(self, labels: tuple, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+    
+    def _samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in list(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                bucket_labels = self._labels(labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {total}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {count}")
+        return lines
+
+METRICS: List[Metric] = []
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests being served.", ("method", "route"))
+http_response_size = Histogram(
+    "http_response_size_bytes", "HTTP response body size on the wire.", ("method", "route"), SIZE_BUCKETS
+)
+mongo_latency = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency.", ("collection", "command", "outcome")
+)
+
+def command_collection(command_name: str, command: Dict[str, Any]) -> str:
+    # Most commands name their collection as the command's value; getMore carries the cursor id there
+    collection = command.get("collection" if command_name == "getMore" else command_name)
+    return collection if isinstance(collection, str) else ""
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        # request_id -> collection; started and succeeded/failed arrive as separate events
+        self._collections: Dict[int, str] = {}
+    
+    def started(self, event):
+        self._collections[event.request_id] = command_collection(event.command_name, event.command)
+    
+    def _finish(self, event, outcome: str):
+        collection = self._collections.pop(event.request_id, "")
+        mongo_latency.observe((collection, event.command_name, outcome), event.duration_micros / 1e6)
+    
+    def succeeded(self, event):
+        self._finish(event, "ok")
+    
+    def failed(self, event):
+        self._finish(event, "error")
+
+# Slow-query log
+SLOW_QUERY_MS = int(os.environ.get("SLOW_QUERY_MS", 100))
+SLOW_QUERY_EXPLAIN_RATE = float(os.environ.get("SLOW_QUERY_EXPLAIN_RATE", 0))
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+
+# Route template of the request being served; Motor copies the context into its executor threads
+request_route: ContextVar[str] = ContextVar("request_route", default="background")
+
+# Named after the server module, so logging config written for it still applies
+slow_query_logger = logging.getLogger("server.slow_queries")
+
+def redact_shape(value):
+    """Keep keys and operators, replace every value with "?" so queries group by shape."""
+    if isinstance(value, dict):
+        return {key: redact_shape(inner) for key, inner in value.items()}
+    if isinstance(value, (list, tuple)):
+        # A list of conditions ($or, $and, pipelines) keeps its structure; a list of values collapses
+        if value and all(isinstance(inner, dict) for inner in value):
+            return [redact_shape(inner) for inner in value]
+        return ["?"] if value else []
+    return "?"
+
+def command_shape(command_name: str, command) -> Dict[str, Any]:
+    if command_name == "aggregate":
+        return {"pipeline": redact_shape(command.get("pipeline", []))}
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        return {"filter": redact_shape(statements[0].get("q", {}))}
+    shape = {"filter": redact_shape(command.get("filter", command.get("query", {})))}
+    if command.get("sort"):
+        shape["sort"] = dict(command["sort"])
+    return shape
+
+def plan_summary(explain_result: Dict[str, Any]) -> str:
+    """Flatten the winning plan to e.g. "FETCH > IXSCAN(owner_id_1)"."""
+    planner = explain_result.get("queryPlanner")
+    if planner is None:
+        # Aggregations report the planner of their first $cursor stage
+        for stage in explain_result.get("stages", []):
+            if "$cursor" in stage:
+                planner = stage["$cursor"].get("queryPlanner")
+                break
+    stages = []
+    plan = (planner or {}).get("winningPlan", {})
+    plan = plan.get("queryPlan", plan)
+    while plan:
+        stage = plan.get("stage", "?")
+        stages.append(f"{stage}({plan['indexName']})" if "indexName" in plan else stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " > ".join(stages) or "unknown"
+
+class SlowQueryLog(monitoring.CommandListener):
+    """Logs commands slower than SLOW_QUERY_MS with their redacted shape and originating route.
+
+    A sampled fraction of distinct offending shapes is re-run through explain on the event loop.
+    """
+    
+    def __init__(self, threshold_ms: int = SLOW_QUERY_MS, explain_rate: float = SLOW_QUERY_EXPLAIN_RATE):
+        self.threshold_micros = threshold_ms * 1000
+        self.explain_rate = explain_rate
+        # Both set on startup; the client is the one this listener is registered with
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.client = None
+        # request_id -> (command, route)
+        self._pending: Dict[int, tuple] = {}
+        self._explained: set = set()
+    
+    def started(self, event):
+        if event.command_name != "explain":
+            self._pending[event.request_id] = (event.command, request_route.get())
+    
+    def succeeded(self, event):
+        pending = self._pending.pop(event.request_id, None)
+        if pending is not None and event.duration_micros >= self.threshold_micros:
+            self._report(event, *pending)
+    
+    def failed(self, event):
+        self._pending.pop(event.request_id, None)
+    
+    def _report(self, event, command, route: str):
+        collection = command_collection(event.command_name, command)
+        shape = command_shape(event.command_name, command)
+        slow_query_logger.warning(
+            "Slow %s on %s took %.1f ms (route %s): %s",
+            event.command_name, collection, event.duration_micros / 1000, route,
+            json.dumps(shape, default=str)
+        )
+        if event.command_name not in EXPLAINABLE_COMMANDS or self.loop is None:
+            return
+        key = (event.database_name, collection, json.dumps(shape, default=str, sort_keys=True))
+        if key in self._explained or random.random() >= self.explain_rate:
+            return
+        self._explained.add(key)
+        # Session, cluster time and read preference fields belong to the original command only
+        explainable = {name: value for name, value in command.items() if not name.startswith("$") and name != "lsid"}
+        asyncio.run_coroutine_threadsafe(
+            self._explain(event.database_name, event.command_name, collection, explainable), self.loop
+        )
+    
+    async def _explain(self, database_name: str, command_name: str, collection: str, command: Dict[str, Any]):
+        try:
+            result = await self.client[database_name].command({"explain": command, "verbosity": "queryPlanner"})
+        except Exception:
+            slow_query_logger.exception("Could not explain slow %s on %s", command_name, collection)
+            return
+        slow_query_logger.warning("Plan for slow %s on %s: %s", command_name, collection, plan_summary(result))
+
+slow_query_log = SlowQueryLog()
+
+class MetricsMiddleware:
+    """Per-route request count, latency, in-flight and response size; labels use the route template."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    @staticmethod
+    def route_label(scope) -> str:
+        for route in scope["app"].routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        labels = (scope["method"], self.route_label(scope))
+        start = time.perf_counter()
+        status_code = 500
+        size = 0
+        
+        async def send_measured(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+        
+        http_in_flight.inc(labels)
+        route_token = request_route.set(labels[1])
+        try:
+            await self.app(scope, receive, send_measured)
+        finally:
+            request_route.reset(route_token)
+            http_in_flight.dec(labels)
+            http_requests.inc(labels + (str(status_code),))
+            http_latency.observe(labels, time.perf_counter() - start)
+            http_response_size.observe(labels, size)
@@ -0,0 +1,204 @@
+from pydantic import BaseModel, Field, EmailStr, field_validator
+from typing import List, Optional, Dict, Any
+import uuid
+from datetime import datetime
+from enum import Enum
+
+# Locations are stored as GeoJSON Points and exposed as {"lat": 0.0, "lng": 0.0}
+def to_geojson_point(location: Dict[str, float]) -> Dict[str, Any]:
+    # GeoJSON wants [longitude, latitude]
+    return {"type": "Point", "coordinates": [float(location["lng"]), float(location["lat"])]}
+
+def from_geojson_point(value: Any) -> Any:
+    if isinstance(value, dict) and value.get("type") == "Point":
+        lng, lat = value["coordinates"]
+        return {"lat": lat, "lng": lng}
+    return value
+
+# Enums
+class UserRole(str, Enum):
+    USER = "user"
+    ADMIN = "admin"
+
+class BookingStatus(str, Enum):
+    PENDING = "pending"
+    APPROVED = "approved"
+    REJECTED = "rejected"
+    ACTIVE = "active"
+    COMPLETED = "completed"
+    DISPUTED = "disputed"
+
+class ItemCategory(str, Enum):
+    CAMERA = "camera"
+    TOOLS = "tools"
+    CAMPING = "camping"
+    ELECTRONICS = "electronics"
+    SPORTS = "sports"
+    AUTOMOTIVE = "automotive"
+    HOME = "home"
+    OTHER = "other"
+
+class DisputeStatus(str, Enum):
+    OPEN = "open"
+    INVESTIGATING = "investigating"
+    RESOLVED = "resolved"
+
+# Models
+class User(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    email: EmailStr
+    phone: Optional[str] = None
+    password_hash: str
+    first_name: str
+    last_name: str
+    profile_photo: Optional[str] = None  # photo reference
+    bio: Optional[str] = None
+    is_verified: bool = False
+    verification_document: Optional[str] = None  # photo reference
+    rating: float = 0.0  # rating_sum / rating_count
+    total_reviews: int = 0
+    rating_sum: int = 0
+    rating_count: int = 0
+    role: UserRole = UserRole.USER
+    location: Optional[Dict[str, float]] = None  # {"lat": 0.0, "lng": 0.0}
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)  # drives the /auth/me ETag
+    is_active: bool = True
+
+class UserCreate(BaseModel):
+    email: EmailStr
+    phone: Optional[str] = None
+    password: str
+    first_name: str
+    last_name: str
+
+class CurrentUser(BaseModel):
+    # Slim per-request view of the caller, see current_user
+    id: str
+    role: UserRole = UserRole.USER
+    is_active: bool = True
+    first_name: str
+    last_name: str
+
+class UserLogin(BaseModel):
+    email: EmailStr
+    password: str
+
+class UserProfile(BaseModel):
+    id: str
+    email: str
+    phone: Optional[str]
+    first_name: str
+    last_name: str
+    profile_photo: Optional[str]
+    bio: Optional[str]
+    is_verified: bool
+    rating: float
+    total_reviews: int
+    location: Optional[Dict[str, float]]
+    created_at: datetime
+
+class Item(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    owner_id: str
+    title: str
+    description: str
+    category: ItemCategory
+    photos: List[str] = []  # photo references
+    price_per_day: float
+    price_per_hour: Optional[float] = None
+    location: Dict[str, float]  # {"lat": 0.0, "lng": 0.0}, stored as a GeoJSON Point
+    address: str
+    # Owner-blocked days live in the document's "availability" bitmap, see AvailabilityCalendar
+    is_available: bool = True
+    rating: float = 0.0  # rating_sum / rating_count
+    total_reviews: int = 0
+    rating_sum: int = 0
+    rating_count: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    @field_validator("location", mode="before")
+    @classmethod
+    def location_from_geojson(cls, value):
+        return from_geojson_point(value)
+
+class ItemSearchResult(Item):
+    distance_km: Optional[float] = None
+    cover_photo: Optional[str] = None  # thumbnail reference; list endpoints omit photos
+
+class PhotoVariant(str, Enum):
+    THUMB = "thumb"
+    CARD = "card"
+    FULL = "full"
+
+class ItemSort(str, Enum):
+    NEWEST = "newest"
+    RATING = "rating"
+
+class ItemCreate(BaseModel):
+    title: str
+    description: str
+    category: ItemCategory
+    photos: List[str] = []
+    price_per_day: float
+    price_per_hour: Optional[float] = None
+    location: Dict[str, float]
+    address: str
+
+class Booking(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    item_id: str
+    renter_id: str
+    owner_id: str
+    start_date: datetime
+    end_date: datetime
+    total_amount: float
+    deposit_amount: float
+    status: BookingStatus = BookingStatus.PENDING
+    payment_id: Optional[str] = None  # Mock payment ID
+    damage_photos_before: List[str] = []  # photo references
+    damage_photos_after: List[str] = []
+    notes: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class BookingCreate(BaseModel):
+    item_id: str
+    start_date: datetime
+    end_date: datetime
+    notes: Optional[str] = None
+
+class Review(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    booking_id: str
+    reviewer_id: str
+    reviewed_id: str  # Can be user or item
+    reviewed_type: str  # "user" or "item"
+    rating: int = Field(ge=1, le=5)
+    comment: Optional[str] = None
+    photos: List[str] = []  # photo references
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ReviewCreate(BaseModel):
+    booking_id: str
+    reviewed_id: str
+    reviewed_type: str
+    rating: int = Field(ge=1, le=5)
+    comment: Optional[str] = None
+    photos: List[str] = []
+
+class Dispute(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    booking_id: str
+    reported_by: str
+    reported_against: str
+    reason: str
+    description: str
+    evidence_photos: List[str] = []  # photo references
+    status: DisputeStatus = DisputeStatus.OPEN
+    admin_notes: Optional[str] = None
+    resolution: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    resolved_at: Optional[datetime] = None
+
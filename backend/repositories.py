@@ -0,0 +1,941 @@
+import heapq
+import itertools
+import math
+import re
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from enum import Enum
+from typing import List, Optional, Dict, Any
+from pydantic import BaseModel
+from pymongo import DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from models import Item, ItemCategory, ItemSort, to_geojson_point
+
+# Repositories: handlers go through these instead of db, so the API logic can run against
+# MongoDB or an in-process store (REPOSITORY_BACKEND=memory) for benchmarks and tests.
+# Documents keep their MongoDB shape in both backends, and item filters are the dicts
+# build_item_filter/keyset_filter produce, which the memory backend evaluates itself.
+
+# Keyset pagination: sort field per ItemSort, always tie-broken by the unique item id
+ITEM_SORT_FIELDS = {
+    ItemSort.NEWEST: "created_at",
+    ItemSort.RATING: "rating",
+}
+
+# Ratings are kept as running sums so a new review is a single O(1) update
+# Documents written before the running sums existed only have rating and total_reviews
+CURRENT_RATING_SUM = {"$ifNull": [
+    "$rating_sum", {"$multiply": [{"$ifNull": ["$rating", 0]}, {"$ifNull": ["$total_reviews", 0]}]}
+]}
+CURRENT_RATING_COUNT = {"$ifNull": ["$rating_count", {"$ifNull": ["$total_reviews", 0]}]}
+
+def current_rating_totals(document: Dict[str, Any]) -> tuple:
+    # (rating_sum, rating_count) of a document, with the same legacy fallback as CURRENT_RATING_SUM
+    rating_sum = document.get("rating_sum")
+    if rating_sum is None:
+        rating_sum = (document.get("rating") or 0) * (document.get("total_reviews") or 0)
+    rating_count = document.get("rating_count")
+    if rating_count is None:
+        rating_count = document.get("total_reviews") or 0
+    return rating_sum, rating_count
+
+def rating_increment(rating: int) -> List[Dict[str, Any]]:
+    # Update pipeline: bump the counters and derive the average in one atomic write
+    return [
+        {"$set": {
+            "rating_sum": {"$add": [CURRENT_RATING_SUM, rating]},
+            "rating_count": {"$add": [CURRENT_RATING_COUNT, 1]},
+        }},
+        {"$set": {
+            "rating": {"$divide": ["$rating_sum", "$rating_count"]},
+            "total_reviews": "$rating_count",
+            "updated_at": "$$NOW",
+        }},
+    ]
+
+# Availability: one reservation document per (item, day), so the unique _id rejects overlaps
+DUPLICATE_KEY_ERROR = 11000
+
+def reservation_key(item_id: str, day: date) -> str:
+    return f"{item_id}:{day.isoformat()}"
+
+def geo_near_stage(lat: float, lng: float, max_distance: float, query: Dict[str, Any]) -> Dict[str, Any]:
+    # $geoNear must be the first stage; it filters by radius and sorts nearest first
+    return {
+        "near": to_geojson_point({"lat": lat, "lng": lng}),
+        "distanceField": "distance_km",
+        "distanceMultiplier": 0.001,
+        "maxDistance": max_distance * 1000,
+        "spherical": True,
+        "query": query,
+    }
+
+# Popular feed key for all categories together; the others are keyed by category
+POPULAR_ALL = "all"
+# Lower bounds of the price histogram buckets; prices from the last one up count as "top"
+PRICE_HISTOGRAM_BOUNDARIES = [0, 10, 25, 50, 100, 250, 500]
+
+# Mean earth radius MongoDB uses for spherical $geoNear distances
+EARTH_RADIUS_KM = 6378.1
+
+def field_projection(fields: Optional[List[str]]) -> Optional[Dict[str, int]]:
+    return {field: 1 for field in fields} if fields else None
+
+class UserRepository(ABC):
+    @abstractmethod
+    async def get(self, user_id: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]: ...
+    
+    @abstractmethod
+    async def get_by_email(self, email: str) -> Optional[Dict[str, Any]]: ...
+    
+    @abstractmethod
+    async def insert(self, user_doc: Dict[str, Any]): ...
+    
+    @abstractmethod
+    async def update(self, user_id: str, changes: Dict[str, Any], expected: Optional[Dict[str, Any]] = None) -> bool:
+        """$set changes if the user exists and matches expected; False when nothing matched."""
+    
+    @abstractmethod
+    async def update_and_get(self, user_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]: ...
+    
+    @abstractmethod
+    async def add_rating(self, user_id: str, rating: int): ...
+    
+    @abstractmethod
+    async def set_rating_totals(self, totals: List[tuple]) -> int:
+        """Overwrite the aggregates from (id, rating_sum, rating_count) tuples; returns documents changed."""
+
+class ItemRepository(ABC):
+    @abstractmethod
+    async def get(self, item_id: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]: ...
+    
+    @abstractmethod
+    async def get_many(self, item_ids: List[str]) -> List[Dict[str, Any]]: ...
+    
+    @abstractmethod
+    async def insert(self, item_doc: Dict[str, Any]): ...
+    
+    @abstractmethod
+    async def update(self, item_id: str, changes: Dict[str, Any], expected: Optional[Dict[str, Any]] = None) -> bool: ...
+    
+    @abstractmethod
+    async def append(self, item_id: str, field: str, values: List[Any], changes: Optional[Dict[str, Any]] = None): ...
+    
+    @abstractmethod
+    async def list_by_owner(self, owner_id: str, limit: int = 100) -> List[Dict[str, Any]]: ...
+    
+    @abstractmethod
+    async def search(
+        self, filter_query: Dict[str, Any], sort: ItemSort, skip: int, limit: int
+    ) -> List[Dict[str, Any]]:
+        """Items matching filter_query, newest or best rated first, tie-broken by id descending."""
+    
+    @abstractmethod
+    async def search_near(
+        self,
+        filter_query: Dict[str, Any],
+        lat: float,
+        lng: float,
+        max_distance: float,
+        skip: int,
+        limit: int,
+        min_distance: float = 0,
+        exclude_ids: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Items within max_distance km, nearest first, each with distance_km set."""
+    
+    @abstractmethod
+    async def facets(
+        self, filter_query: Dict[str, Any], category: Optional[ItemCategory], geo: Optional[tuple]
+    ) -> Dict[str, Any]:
+        """{"categories": {category: count}, "prices": {bucket lower bound or "top": count}, "total": count};
+        category narrows prices and total but not the category counts."""
+    
+    @abstractmethod
+    async def top_rated(self, limit: int, category: Optional[ItemCategory] = None) -> List[Dict[str, Any]]: ...
+    
+    @abstractmethod
+    async def popular_feeds(self, size: int, prior_weight: float) -> Dict[str, List[Dict[str, Any]]]:
+        """Top items by Bayesian average rating, overall (POPULAR_ALL) and per category."""
+    
+    @abstractmethod
+    async def store_popular_feeds(self, feeds: Dict[str, List[Dict[str, Any]]]): ...
+    
+    @abstractmethod
+    async def load_popular_feeds(self) -> Dict[str, List[Dict[str, Any]]]: ...
+    
+    @abstractmethod
+    async def add_rating(self, item_id: str, rating: int): ...
+    
+    @abstractmethod
+    async def set_rating_totals(self, totals: List[tuple]) -> int: ...
+
+class BookingRepository(ABC):
+    @abstractmethod
+    async def get(self, booking_id: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]: ...
+    
+    @abstractmethod
+    async def insert(self, booking_doc: Dict[str, Any]): ...
+    
+    @abstractmethod
+    async def update_and_get(
+        self, booking_id: str, changes: Dict[str, Any], expected: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """$set changes if the booking exists and matches expected; the updated document or None."""
+    
+    @abstractmethod
+    async def append(self, booking_id: str, field: str, values: List[Any], changes: Optional[Dict[str, Any]] = None): ...
+    
+    @abstractmethod
+    async def list_for_user(self, user_id: str, expansions: set, limit: int = 100) -> List[Dict[str, Any]]:
+        """Bookings as renter or owner; expansions may add "item" (summary, raw cover_photo) and "counterparty"."""
+    
+    @abstractmethod
+    async def reserve(self, item_id: str, booking_id: str, days: List[date]) -> bool:
+        """Claim every day for the booking; False (with nothing claimed) if any day is taken."""
+    
+    @abstractmethod
+    async def release(self, booking_id: str): ...
+    
+    @abstractmethod
+    async def reserved_days(self, item_id: str, start: date, end: date) -> set: ...
+
+class ReviewRepository(ABC):
+    @abstractmethod
+    async def insert(self, review_doc: Dict[str, Any]): ...
+    
+    @abstractmethod
+    async def list_for(self, reviewed_id: str, reviewed_type: str, limit: int = 100) -> List[Dict[str, Any]]: ...
+    
+    @abstractmethod
+    def rating_totals(self, reviewed_type: str):
+        """Async iterator of (reviewed_id, rating_sum, rating_count)."""
+
+class DisputeRepository(ABC):
+    @abstractmethod
+    async def get(self, dispute_id: str) -> Optional[Dict[str, Any]]: ...
+    
+    @abstractmethod
+    async def insert(self, dispute_doc: Dict[str, Any]): ...
+    
+    @abstractmethod
+    async def update_and_get(self, dispute_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]: ...
+    
+    @abstractmethod
+    async def list_for_booking(self, booking_id: str) -> List[Dict[str, Any]]: ...
+
+class Repositories(BaseModel):
+    model_config = {"arbitrary_types_allowed": True}
+    
+    users: UserRepository
+    items: ItemRepository
+    bookings: BookingRepository
+    reviews: ReviewRepository
+    disputes: DisputeRepository
+    
+    def rating_target(self, reviewed_type: str):
+        # Ratings are kept as running sums on the reviewed user or item
+        return {"user": self.users, "item": self.items}.get(reviewed_type)
+
+# MongoDB backend
+class MotorUserRepository(UserRepository):
+    def __init__(self, database):
+        self.collection = database.users
+    
+    async def get(self, user_id, fields=None):
+        return await self.collection.find_one({"id": user_id}, field_projection(fields))
+    
+    async def get_by_email(self, email):
+        return await self.collection.find_one({"email": email})
+    
+    async def insert(self, user_doc):
+        await self.collection.insert_one(user_doc)
+    
+    async def update(self, user_id, changes, expected=None):
+        result = await self.collection.update_one({"id": user_id, **(expected or {})}, {"$set": changes})
+        return bool(result.matched_count)
+    
+    async def update_and_get(self, user_id, changes):
+        return await self.collection.find_one_and_update(
+            {"id": user_id}, {"$set": changes}, return_document=ReturnDocument.AFTER
+        )
+    
+    async def add_rating(self, user_id, rating):
+        await self.collection.update_one({"id": user_id}, rating_increment(rating))
+    
+    async def set_rating_totals(self, totals):
+        if not totals:
+            return 0
+        result = await self.collection.bulk_write(rating_totals_writes(totals), ordered=False)
+        return result.modified_count
+
+class MotorItemRepository(ItemRepository):
+    def __init__(self, database):
+        self.collection = database.items
+        self.popular = database.popular_items
+    
+    async def get(self, item_id, fields=None):
+        return await self.collection.find_one({"id": item_id}, field_projection(fields))
+    
+    async def get_many(self, item_ids):
+        return await self.collection.find({"id": {"$in": item_ids}}).to_list(len(item_ids))
+    
+    async def insert(self, item_doc):
+        await self.collection.insert_one(item_doc)
+    
+    async def update(self, item_id, changes, expected=None):
+        result = await self.collection.update_one({"id": item_id, **(expected or {})}, {"$set": changes})
+        return bool(result.matched_count)
+    
+    async def append(self, item_id, field, values, changes=None):
+        update = {"$push": {field: {"$each": values}}}
+        if changes:
+            update["$set"] = changes
+        await self.collection.update_one({"id": item_id}, update)
+    
+    async def list_by_owner(self, owner_id, limit=100):
+        return await self.collection.find({"owner_id": owner_id}).to_list(limit)
+    
+    async def search(self, filter_query, sort, skip, limit):
+        field = ITEM_SORT_FIELDS[sort]
+        return await self.collection.find(filter_query).sort(
+            [(field, DESCENDING), ("id", DESCENDING)]
+        ).skip(skip).limit(limit).to_list(limit)
+    
+    async def search_near(self, filter_query, lat, lng, max_distance, skip, limit, min_distance=0, exclude_ids=None):
+        geo_near = geo_near_stage(lat, lng, max_distance, filter_query)
+        pipeline = [{"$geoNear": geo_near}]
+        if min_distance:
+            geo_near["minDistance"] = min_distance * 1000
+        if exclude_ids:
+            pipeline.append({"$match": {"id": {"$nin": exclude_ids}}})
+        pipeline += [{"$skip": skip}, {"$limit": limit}]
+        return await self.collection.aggregate(pipeline).to_list(limit)
+    
+    async def facets(self, filter_query, category, geo):
+        pipeline = [{"$geoNear": geo_near_stage(*geo, filter_query)}] if geo else [{"$match": filter_query}]
+        selected = [{"$match": {"category": category.value}}] if category else []
+        pipeline.append({"$facet": {
+            "categories": [{"$group": {"_id": "$category", "count": {"$sum": 1}}}],
+            "prices": selected + [{"$bucket": {
+                "groupBy": "$price_per_day",
+                "boundaries": PRICE_HISTOGRAM_BOUNDARIES,
+                "default": "top",
+                "output": {"count": {"$sum": 1}},
+            }}],
+            "total": selected + [{"$count": "count"}],
+        }})
+        result = (await self.collection.aggregate(pipeline).to_list(1))[0]
+        return {
+            "categories": {bucket["_id"]: bucket["count"] for bucket in result["categories"]},
+            "prices": {bucket["_id"]: bucket["count"] for bucket in result["prices"]},
+            "total": result["total"][0]["count"] if result["total"] else 0,
+        }
+    
+    async def top_rated(self, limit, category=None):
+        filter_query = {"is_available": True}
+        if category:
+            filter_query["category"] = category
+        return await self.collection.find(filter_query).sort("rating", -1).limit(limit).to_list(limit)
+    
+    async def popular_feeds(self, size, prior_weight):
+        rating_sum, rating_count = CURRENT_RATING_SUM, CURRENT_RATING_COUNT
+        totals = await self.collection.aggregate([
+            {"$match": {"is_available": True}},
+            {"$group": {"_id": None, "sum": {"$sum": rating_sum}, "count": {"$sum": rating_count}}},
+        ]).to_list(1)
+        global_mean = totals[0]["sum"] / totals[0]["count"] if totals and totals[0]["count"] else 0.0
+        
+        top = [{"$sort": {"popularity": -1, "id": 1}}, {"$limit": size}]
+        facets = {POPULAR_ALL: top}
+        for category in ItemCategory:
+            facets[category.value] = [{"$match": {"category": category.value}}] + top
+        # Only what ItemSearchResult renders, and just the cover photo: $facet returns a single
+        # document, and items with inline base64 photos would push it past 16MB
+        rendered = {field: 1 for field in Item.model_fields if field != "photos"}
+        result = await self.collection.aggregate([
+            {"$match": {"is_available": True}},
+            {"$project": {**rendered, "_id": 0, "photos": {"$slice": ["$photos", 1]}}},
+            {"$set": {"popularity": {"$divide": [
+                {"$add": [prior_weight * global_mean, rating_sum]},
+                {"$add": [prior_weight, rating_count]},
+            ]}}},
+            {"$facet": facets},
+        ], allowDiskUse=True).to_list(1)
+        return result[0] if result else {}
+    
+    async def store_popular_feeds(self, feeds):
+        # Shared copy so other workers (and restarts) have a feed before their first refresh
+        for key, items in feeds.items():
+            await self.popular.replace_one(
+                {"_id": key},
+                {"_id": key, "items": [without_object_id(item) for item in items], "refreshed_at": datetime.utcnow()},
+                upsert=True
+            )
+    
+    async def load_popular_feeds(self):
+        return {feed["_id"]: feed["items"] async for feed in self.popular.find()}
+    
+    async def add_rating(self, item_id, rating):
+        await self.collection.update_one({"id": item_id}, rating_increment(rating))
+    
+    async def set_rating_totals(self, totals):
+        if not totals:
+            return 0
+        result = await self.collection.bulk_write(rating_totals_writes(totals), ordered=False)
+        return result.modified_count
+
+class MotorBookingRepository(BookingRepository):
+    def __init__(self, database):
+        self.collection = database.bookings
+        self.reservations = database.reservations
+    
+    async def get(self, booking_id, fields=None):
+        return await self.collection.find_one({"id": booking_id}, field_projection(fields))
+    
+    async def insert(self, booking_doc):
+        await self.collection.insert_one(booking_doc)
+    
+    async def update_and_get(self, booking_id, changes, expected=None):
+        return await self.collection.find_one_and_update(
+            {"id": booking_id, **(expected or {})}, {"$set": changes}, return_document=ReturnDocument.AFTER
+        )
+    
+    async def append(self, booking_id, field, values, changes=None):
+        update = {"$push": {field: {"$each": values}}}
+        if changes:
+            update["$set"] = changes
+        await self.collection.update_one({"id": booking_id}, update)
+    
+    async def list_for_user(self, user_id, expansions, limit=100):
+        pipeline = [
+            {"$match": {
+                "$or": [
+                    {"renter_id": user_id},
+                    {"owner_id": user_id}
+                ]
+            }},
+            {"$limit": limit},
+        ]
+        if "item" in expansions:
+            pipeline += [
+                {"$lookup": {
+                    "from": "items",
+                    "localField": "item_id",
+                    "foreignField": "id",
+                    # Only the summary fields leave the items collection, never the photo list
+                    "pipeline": [{"$project": {
+                        "_id": 0, "id": 1, "title": 1, "category": 1, "address": 1, "price_per_day": 1,
+                        "cover_photo": {"$arrayElemAt": ["$photos", 0]},
+                    }}],
+                    "as": "item",
+                }},
+                {"$set": {"item": {"$first": "$item"}}},
+            ]
+        if "counterparty" in expansions:
+            pipeline += [
+                {"$set": {"counterparty_id": {
+                    "$cond": [{"$eq": ["$renter_id", user_id]}, "$owner_id", "$renter_id"]
+                }}},
+                {"$lookup": {
+                    "from": "users",
+                    "localField": "counterparty_id",
+                    "foreignField": "id",
+                    "pipeline": [{"$project": {"_id": 0, "id": 1, "first_name": 1, "last_name": 1, "rating": 1}}],
+                    "as": "counterparty",
+                }},
+                {"$set": {"counterparty": {"$first": "$counterparty"}}},
+            ]
+        return await self.collection.aggregate(pipeline).to_list(limit)
+    
+    async def reserve(self, item_id, booking_id, days):
+        now = datetime.utcnow()
+        try:
+            # Single round trip; ordered inserts stop at the first day that is already taken
+            await self.reservations.insert_many([
+                {
+                    "_id": reservation_key(item_id, day),
+                    "item_id": item_id,
+                    "day": day.isoformat(),
+                    "booking_id": booking_id,
+                    "created_at": now,
+                }
+                for day in days
+            ], ordered=True)
+        except BulkWriteError as e:
+            await self.release(booking_id)
+            if any(error["code"] == DUPLICATE_KEY_ERROR for error in e.details.get("writeErrors", [])):
+                return False
+            raise
+        return True
+    
+    async def release(self, booking_id):
+        await self.reservations.delete_many({"booking_id": booking_id})
+    
+    async def reserved_days(self, item_id, start, end):
+        reservations = await self.reservations.find(
+            {"item_id": item_id, "day": {"$gte": start.isoformat(), "$lt": end.isoformat()}},
+            {"day": 1}
+        ).to_list(None)
+        return {date.fromisoformat(reservation["day"]) for reservation in reservations}
+
+class MotorReviewRepository(ReviewRepository):
+    def __init__(self, database):
+        self.collection = database.reviews
+    
+    async def insert(self, review_doc):
+        await self.collection.insert_one(review_doc)
+    
+    async def list_for(self, reviewed_id, reviewed_type, limit=100):
+        return await self.collection.find({
+            "reviewed_id": reviewed_id,
+            "reviewed_type": reviewed_type
+        }).to_list(limit)
+    
+    async def rating_totals(self, reviewed_type):
+        totals = self.collection.aggregate([
+            {"$match": {"reviewed_type": reviewed_type}},
+            {"$group": {"_id": "$reviewed_id", "sum": {"$sum": "$rating"}, "count": {"$sum": 1}}},
+        ])
+        async for total in totals:
+            yield total["_id"], total["sum"], total["count"]
+
+class MotorDisputeRepository(DisputeRepository):
+    def __init__(self, database):
+        self.collection = database.disputes
+    
+    async def get(self, dispute_id):
+        return await self.collection.find_one({"id": dispute_id})
+    
+    async def insert(self, dispute_doc):
+        await self.collection.insert_one(dispute_doc)
+    
+    async def update_and_get(self, dispute_id, changes):
+        return await self.collection.find_one_and_update(
+            {"id": dispute_id}, {"$set": changes}, return_document=ReturnDocument.AFTER
+        )
+    
+    async def list_for_booking(self, booking_id):
+        return await self.collection.find({"booking_id": booking_id}).to_list(None)
+
+def rating_totals_update(rating_sum: float, rating_count: int) -> Dict[str, Any]:
+    return {
+        "rating_sum": rating_sum,
+        "rating_count": rating_count,
+        "rating": rating_sum / rating_count,
+        "total_reviews": rating_count,
+    }
+
+def rating_totals_writes(totals: List[tuple]) -> List[UpdateOne]:
+    # Only documents whose totals differ are touched, and those get a new updated_at so their ETags change
+    now = datetime.utcnow()
+    writes = []
+    for target_id, rating_sum, rating_count in totals:
+        update = rating_totals_update(rating_sum, rating_count)
+        writes.append(UpdateOne(
+            {"id": target_id, "$or": [{field: {"$ne": value}} for field, value in update.items()]},
+            {"$set": {**update, "updated_at": now}}
+        ))
+    return writes
+
+def without_object_id(document: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in document.items() if key != "_id"}
+
+# In-memory backend
+def match_document(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """Evaluates the subset of MongoDB filter syntax the item filters use."""
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(match_document(document, branch) for branch in condition):
+                return False
+        elif key == "$and":
+            if not all(match_document(document, branch) for branch in condition):
+                return False
+        elif isinstance(condition, dict) and condition and next(iter(condition)).startswith("$"):
+            if not match_operators(document.get(key), condition):
+                return False
+        elif document.get(key) != condition:
+            return False
+    return True
+
+def match_operators(value: Any, operators: Dict[str, Any]) -> bool:
+    for operator, operand in operators.items():
+        if operator == "$regex":
+            flags = re.IGNORECASE if "i" in operators.get("$options", "") else 0
+            if not isinstance(value, str) or not re.search(operand, value, flags):
+                return False
+        elif operator == "$options":
+            continue
+        elif operator == "$in":
+            if value not in operand:
+                return False
+        elif operator == "$nin":
+            if value in operand:
+                return False
+        elif operator == "$ne":
+            if value == operand:
+                return False
+        elif operator == "$exists":
+            if (value is not None) != operand:
+                return False
+        elif value is None:
+            # Range operators never match a missing field
+            return False
+        elif operator == "$gte" and not value >= operand:
+            return False
+        elif operator == "$gt" and not value > operand:
+            return False
+        elif operator == "$lte" and not value <= operand:
+            return False
+        elif operator == "$lt" and not value < operand:
+            return False
+    return True
+
+def plain_value(value: Any) -> Any:
+    # Stored like the driver would encode it: str enums hash by name, so index keys need the value
+    return value.value if isinstance(value, Enum) else value
+
+def distance_km(location: Dict[str, Any], lat: float, lng: float) -> float:
+    item_lng, item_lat = location["coordinates"]
+    phi1, phi2 = math.radians(lat), math.radians(item_lat)
+    half_dphi = (phi2 - phi1) / 2
+    half_dlambda = math.radians(item_lng - lng) / 2
+    a = math.sin(half_dphi) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+class MemoryCollection:
+    """Documents by id, with hash indexes on a few fields.
+    
+    Reads hand out shallow copies, like documents decoded from the wire, since handlers add keys to them;
+    writes replace nested values rather than mutating them, so the copies stay independent.
+    """
+    
+    def __init__(self, indexed_fields: tuple = (), unique_fields: tuple = ()):
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.indexes: Dict[str, Dict[Any, set]] = {field: {} for field in indexed_fields + unique_fields}
+        self.unique_fields = unique_fields
+    
+    def get(self, document_id: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        document = self.documents.get(document_id)
+        if document is None:
+            return None
+        if fields:
+            # Like MongoDB's _id, the key is always part of a projection, so a found document is never empty
+            return {"id": document_id, **{field: document[field] for field in fields if field in document}}
+        return dict(document)
+    
+    def insert(self, document: Dict[str, Any]):
+        document = {key: plain_value(value) for key, value in document.items() if key != "_id"}
+        # Raised like a unique index violation in MongoDB, so handlers treat both backends alike
+        if document["id"] in self.documents:
+            raise DuplicateKeyError(f"Duplicate id {document['id']}", DUPLICATE_KEY_ERROR)
+        for field in self.unique_fields:
+            if self.indexes[field].get(document.get(field)):
+                raise DuplicateKeyError(f"Duplicate {field} {document.get(field)}", DUPLICATE_KEY_ERROR)
+        self.documents[document["id"]] = document
+        for field, index in self.indexes.items():
+            index.setdefault(document.get(field), set()).add(document["id"])
+    
+    def update(self, document_id: str, changes: Dict[str, Any], expected: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        document = self.documents.get(document_id)
+        if document is None or (expected and not all(document.get(k) == v for k, v in expected.items())):
+            return None
+        changes = {key: plain_value(value) for key, value in changes.items()}
+        for field, index in self.indexes.items():
+            if field in changes and changes[field] != document.get(field):
+                index[document.get(field)].discard(document_id)
+                index.setdefault(changes[field], set()).add(document_id)
+        document.update(changes)
+        return dict(document)
+    
+    def find(self, field: str, value: Any) -> List[Dict[str, Any]]:
+        document_ids = self.indexes[field].get(plain_value(value), ())
+        return [dict(self.documents[document_id]) for document_id in document_ids]
+    
+    def scan(self):
+        return self.documents.values()
+
+class MemoryStore:
+    """One per process; the repositories share it so bookings can join items and users."""
+    
+    def __init__(self):
+        self.users = MemoryCollection(unique_fields=("email",))
+        self.items = MemoryCollection(("owner_id", "category"))
+        self.bookings = MemoryCollection(("renter_id", "owner_id"))
+        self.reviews = MemoryCollection(("reviewed_id",))
+        self.disputes = MemoryCollection(("booking_id",))
+        # (item_id, day) -> booking_id, plus the reverse for release
+        self.reservations: Dict[tuple, str] = {}
+        self.reservations_by_booking: Dict[str, List[tuple]] = {}
+        self.popular_feeds: Dict[str, List[Dict[str, Any]]] = {}
+
+def apply_rating(collection: MemoryCollection, document_id: str, rating: int):
+    document = collection.get(document_id, ["rating_sum", "rating_count", "rating", "total_reviews"])
+    if document is None:
+        return
+    rating_sum, rating_count = current_rating_totals(document)
+    rating_sum += rating
+    rating_count += 1
+    collection.update(document_id, {**rating_totals_update(rating_sum, rating_count), "updated_at": datetime.utcnow()})
+
+def set_memory_rating_totals(collection: MemoryCollection, totals: List[tuple]) -> int:
+    now = datetime.utcnow()
+    changed = 0
+    for target_id, rating_sum, rating_count in totals:
+        update = rating_totals_update(rating_sum, rating_count)
+        current = collection.get(target_id, list(update))
+        if current is not None and any(current.get(field) != value for field, value in update.items()):
+            collection.update(target_id, {**update, "updated_at": now})
+            changed += 1
+    return changed
+
+class MemoryUserRepository(UserRepository):
+    def __init__(self, store: MemoryStore):
+        self.collection = store.users
+    
+    async def get(self, user_id, fields=None):
+        return self.collection.get(user_id, fields)
+    
+    async def get_by_email(self, email):
+        matches = self.collection.find("email", email)
+        return matches[0] if matches else None
+    
+    async def insert(self, user_doc):
+        self.collection.insert(user_doc)
+    
+    async def update(self, user_id, changes, expected=None):
+        return self.collection.update(user_id, changes, expected) is not None
+    
+    async def update_and_get(self, user_id, changes):
+        return self.collection.update(user_id, changes)
+    
+    async def add_rating(self, user_id, rating):
+        apply_rating(self.collection, user_id, rating)
+    
+    async def set_rating_totals(self, totals):
+        return set_memory_rating_totals(self.collection, totals)
+
+class MemoryItemRepository(ItemRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+        self.collection = store.items
+    
+    def candidates(self, filter_query: Dict[str, Any]):
+        # The category index narrows the scan; everything else is evaluated per document
+        category = filter_query.get("category")
+        if isinstance(category, str):
+            document_ids = self.collection.indexes["category"].get(plain_value(category), ())
+            documents = (self.collection.documents[document_id] for document_id in document_ids)
+        else:
+            documents = self.collection.scan()
+        return (document for document in documents if match_document(document, filter_query))
+    
+    async def get(self, item_id, fields=None):
+        return self.collection.get(item_id, fields)
+    
+    async def get_many(self, item_ids):
+        return [item for item in (self.collection.get(item_id) for item_id in item_ids) if item is not None]
+    
+    async def insert(self, item_doc):
+        self.collection.insert(item_doc)
+    
+    async def update(self, item_id, changes, expected=None):
+        return self.collection.update(item_id, changes, expected) is not None
+    
+    async def append(self, item_id, field, values, changes=None):
+        current = self.collection.get(item_id, [field])
+        if current is not None:
+            self.collection.update(item_id, {field: current.get(field, []) + list(values), **(changes or {})})
+    
+    async def list_by_owner(self, owner_id, limit=100):
+        return self.collection.find("owner_id", owner_id)[:limit]
+    
+    async def search(self, filter_query, sort, skip, limit):
+        field = ITEM_SORT_FIELDS[sort]
+        page = heapq.nlargest(skip + limit, self.candidates(filter_query), key=lambda item: (item[field], item["id"]))
+        return [dict(item) for item in page[skip:]]
+    
+    async def search_near(self, filter_query, lat, lng, max_distance, skip, limit, min_distance=0, exclude_ids=None):
+        excluded = set(exclude_ids or ())
+        nearby = []
+        for item in self.candidates(filter_query):
+            distance = distance_km(item["location"], lat, lng)
+            if min_distance <= distance <= max_distance and item["id"] not in excluded:
+                nearby.append((distance, item["id"], item))
+        page = heapq.nsmallest(skip + limit, nearby, key=lambda entry: entry[:2])
+        return [{**item, "distance_km": distance} for distance, _, item in page[skip:]]
+    
+    async def facets(self, filter_query, category, geo):
+        categories: Dict[str, int] = {}
+        prices: Dict[Any, int] = {}
+        total = 0
+        for item in self.candidates(filter_query):
+            if geo and distance_km(item["location"], geo[0], geo[1]) > geo[2]:
+                continue
+            categories[item["category"]] = categories.get(item["category"], 0) + 1
+            if category and item["category"] != category:
+                continue
+            total += 1
+            price = item["price_per_day"]
+            if PRICE_HISTOGRAM_BOUNDARIES[0] <= price < PRICE_HISTOGRAM_BOUNDARIES[-1]:
+                bucket = PRICE_HISTOGRAM_BOUNDARIES[bisect_right(PRICE_HISTOGRAM_BOUNDARIES, price) - 1]
+            else:
+                bucket = "top"
+            prices[bucket] = prices.get(bucket, 0) + 1
+        return {"categories": categories, "prices": prices, "total": total}
+    
+    async def top_rated(self, limit, category=None):
+        filter_query = {"is_available": True}
+        if category:
+            filter_query["category"] = category
+        page = heapq.nlargest(limit, self.candidates(filter_query), key=lambda item: item.get("rating", 0))
+        return [dict(item) for item in page]
+    
+    async def popular_feeds(self, size, prior_weight):
+        scored = []
+        total_sum = total_count = 0
+        for item in self.candidates({"is_available": True}):
+            rating_sum, rating_count = current_rating_totals(item)
+            total_sum += rating_sum
+            total_count += rating_count
+            scored.append((rating_sum, rating_count, item))
+        global_mean = total_sum / total_count if total_count else 0.0
+        
+        def rank(entry):
+            rating_sum, rating_count, item = entry
+            popularity = (prior_weight * global_mean + rating_sum) / ((prior_weight + rating_count) or 1)
+            return -popularity, item["id"]
+        
+        ranked = [item for _, _, item in sorted(scored, key=rank)]
+        feeds = {POPULAR_ALL: [dict(item) for item in ranked[:size]]}
+        for category in ItemCategory:
+            in_category = (item for item in ranked if item["category"] == category.value)
+            feeds[category.value] = [dict(item) for item in itertools.islice(in_category, size)]
+        return feeds
+    
+    async def store_popular_feeds(self, feeds):
+        self.store.popular_feeds.update(feeds)
+    
+    async def load_popular_feeds(self):
+        return dict(self.store.popular_feeds)
+    
+    async def add_rating(self, item_id, rating):
+        apply_rating(self.collection, item_id, rating)
+    
+    async def set_rating_totals(self, totals):
+        return set_memory_rating_totals(self.collection, totals)
+
+class MemoryBookingRepository(BookingRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+        self.collection = store.bookings
+    
+    async def get(self, booking_id, fields=None):
+        return self.collection.get(booking_id, fields)
+    
+    async def insert(self, booking_doc):
+        self.collection.insert(booking_doc)
+    
+    async def update_and_get(self, booking_id, changes, expected=None):
+        return self.collection.update(booking_id, changes, expected)
+    
+    async def append(self, booking_id, field, values, changes=None):
+        current = self.collection.get(booking_id, [field])
+        if current is not None:
+            self.collection.update(booking_id, {field: current.get(field, []) + list(values), **(changes or {})})
+    
+    async def list_for_user(self, user_id, expansions, limit=100):
+        bookings = self.collection.find("renter_id", user_id)
+        bookings += [booking for booking in self.collection.find("owner_id", user_id) if booking["renter_id"] != user_id]
+        bookings = bookings[:limit]
+        for booking in bookings:
+            if "item" in expansions:
+                item = self.store.items.get(booking["item_id"], ["id", "title", "category", "address", "price_per_day", "photos"])
+                if item is not None:
+                    photos = item.pop("photos", None)
+                    if photos:
+                        item["cover_photo"] = photos[0]
+                booking["item"] = item
+            if "counterparty" in expansions:
+                counterparty_id = booking["owner_id"] if booking["renter_id"] == user_id else booking["renter_id"]
+                booking["counterparty"] = self.store.users.get(counterparty_id, ["id", "first_name", "last_name", "rating"])
+        return bookings
+    
+    async def reserve(self, item_id, booking_id, days):
+        # Same shape as the ordered insert_many: claim day by day, roll back on the first taken one
+        for day in days:
+            key = (item_id, day.isoformat())
+            if key in self.store.reservations:
+                await self.release(booking_id)
+                return False
+            self.store.reservations[key] = booking_id
+            self.store.reservations_by_booking.setdefault(booking_id, []).append(key)
+        return True
+    
+    async def release(self, booking_id):
+        for key in self.store.reservations_by_booking.pop(booking_id, []):
+            self.store.reservations.pop(key, None)
+    
+    async def reserved_days(self, item_id, start, end):
+        days = (start + timedelta(days=offset) for offset in range((end - start).days))
+        return {day for day in days if (item_id, day.isoformat()) in self.store.reservations}
+
+class MemoryReviewRepository(ReviewRepository):
+    def __init__(self, store: MemoryStore):
+        self.collection = store.reviews
+    
+    async def insert(self, review_doc):
+        self.collection.insert(review_doc)
+    
+    async def list_for(self, reviewed_id, reviewed_type, limit=100):
+        reviews = self.collection.find("reviewed_id", reviewed_id)
+        return [review for review in reviews if review["reviewed_type"] == reviewed_type][:limit]
+    
+    async def rating_totals(self, reviewed_type):
+        totals: Dict[str, list] = {}
+        for review in self.collection.scan():
+            if review["reviewed_type"] == reviewed_type:
+                total = totals.setdefault(review["reviewed_id"], [0, 0])
+                total[0] += review["rating"]
+                total[1] += 1
+        for reviewed_id, (rating_sum, rating_count) in totals.items():
+            yield reviewed_id, rating_sum, rating_count
+
+class MemoryDisputeRepository(DisputeRepository):
+    def __init__(self, store: MemoryStore):
+        self.collection = store.disputes
+    
+    async def get(self, dispute_id):
+        return self.collection.get(dispute_id)
+    
+    async def insert(self, dispute_doc):
+        self.collection.insert(dispute_doc)
+    
+    async def update_and_get(self, dispute_id, changes):
+        return self.collection.update(dispute_id, changes)
+    
+    async def list_for_booking(self, booking_id):
+        return self.collection.find("booking_id", booking_id)
+
+def build_repositories(backend: str, database=None) -> Repositories:
+    # database is the Motor database the mongo backend reads and writes
+    if backend == "mongo":
+        return Repositories(
+            users=MotorUserRepository(database),
+            items=MotorItemRepository(database),
+            bookings=MotorBookingRepository(database),
+            reviews=MotorReviewRepository(database),
+            disputes=MotorDisputeRepository(database),
+        )
+    if backend == "memory":
+        store = MemoryStore()
+        return Repositories(
+            users=MemoryUserRepository(store),
+            items=MemoryItemRepository(store),
+            bookings=MemoryBookingRepository(store),
+            reviews=MemoryReviewRepository(store),
+            disputes=MemoryDisputeRepository(store),
+        )
+    raise ValueError(f"Unknown REPOSITORY_BACKEND {backend!r}, expected 'mongo' or 'memory'")
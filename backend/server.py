@@ -1,31 +1,61 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Depends, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from gridfs.errors import NoFile
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 import os
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional, Dict, Any
 import uuid
-from datetime import datetime, timedelta
-from bson import ObjectId
+from datetime import date, datetime, timedelta
+from bson import Binary, ObjectId
 import hashlib
 import jwt
 import base64
-from enum import Enum
+import binascii
+import functools
+import io
+import json
+import math
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from passlib.context import CryptContext
+from PIL import Image, ImageOps
+from starlette.datastructures import Headers
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# After load_dotenv: these modules read their settings from the environment on import
+from caching import CACHES, TTLCache  # noqa: E402
+from metrics import METRICS, MetricsMiddleware, MongoCommandMetrics, request_route, slow_query_log  # noqa: E402
+from models import (  # noqa: E402
+    Booking, BookingCreate, BookingStatus, CurrentUser, Item, ItemCategory, ItemCreate, ItemSearchResult, ItemSort,
+    PhotoVariant, Review, ReviewCreate, User, UserCreate, UserLogin, UserProfile, UserRole, to_geojson_point
+)
+from repositories import (  # noqa: E402
+    ITEM_SORT_FIELDS, POPULAR_ALL, PRICE_HISTOGRAM_BOUNDARIES, build_repositories, reservation_key
+)
+from response_compression import CompressionMiddleware  # noqa: E402
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandMetrics(), slow_query_log])
 db = client[os.environ['DB_NAME']]
+photo_bucket = AsyncIOMotorGridFSBucket(db, bucket_name="photos")
+# Verification documents (ID scans) are never served from the public photo route
+document_bucket = AsyncIOMotorGridFSBucket(db, bucket_name="documents")
 
 # Create the main app without a prefix
-app = FastAPI(title="LendLoop - P2P Rental Marketplace API")
+app = FastAPI(title="LendLoop - P2P Rental Marketplace API", default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -34,168 +64,501 @@ api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
 SECRET_KEY = "lendloop_secret_key_2025"  # In production, use environment variable
 
-# Enums
-class UserRole(str, Enum):
-    USER = "user"
-    ADMIN = "admin"
-
-class BookingStatus(str, Enum):
-    PENDING = "pending"
-    APPROVED = "approved"
-    REJECTED = "rejected"
-    ACTIVE = "active"
-    COMPLETED = "completed"
-    DISPUTED = "disputed"
-
-class ItemCategory(str, Enum):
-    CAMERA = "camera"
-    TOOLS = "tools"
-    CAMPING = "camping"
-    ELECTRONICS = "electronics"
-    SPORTS = "sports"
-    AUTOMOTIVE = "automotive"
-    HOME = "home"
-    OTHER = "other"
-
-class DisputeStatus(str, Enum):
-    OPEN = "open"
-    INVESTIGATING = "investigating"
-    RESOLVED = "resolved"
-
-# Models
-class User(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    email: EmailStr
-    phone: Optional[str] = None
-    password_hash: str
-    first_name: str
-    last_name: str
-    profile_photo: Optional[str] = None  # base64
-    bio: Optional[str] = None
-    is_verified: bool = False
-    verification_document: Optional[str] = None  # base64
-    rating: float = 0.0
-    total_reviews: int = 0
-    role: UserRole = UserRole.USER
-    location: Optional[Dict[str, float]] = None  # {"lat": 0.0, "lng": 0.0}
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    is_active: bool = True
-
-class UserCreate(BaseModel):
-    email: EmailStr
-    phone: Optional[str] = None
-    password: str
-    first_name: str
-    last_name: str
+# Decoded JWT claims keyed by token digest, kept until the token expires
+token_cache = TTLCache("tokens", maxsize=int(os.environ.get("TOKEN_CACHE_SIZE", 10000)), ttl=7 * 24 * 3600)
 
-class UserLogin(BaseModel):
-    email: EmailStr
-    password: str
+# Slim user records for current_user; per process, so other workers see changes within the TTL
+user_cache = TTLCache("users", maxsize=int(os.environ.get("USER_CACHE_SIZE", 10000)), ttl=float(os.environ.get("USER_CACHE_TTL", 60)))
 
-class UserProfile(BaseModel):
-    id: str
-    email: str
-    phone: Optional[str]
-    first_name: str
-    last_name: str
-    profile_photo: Optional[str]
-    bio: Optional[str]
-    is_verified: bool
-    rating: float
-    total_reviews: int
-    location: Optional[Dict[str, float]]
-    created_at: datetime
-
-class Item(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    owner_id: str
-    title: str
-    description: str
-    category: ItemCategory
-    photos: List[str] = []  # base64 images
-    price_per_day: float
-    price_per_hour: Optional[float] = None
-    location: Dict[str, float]  # {"lat": 0.0, "lng": 0.0}
-    address: str
-    availability_calendar: List[str] = []  # List of unavailable dates in ISO format
-    is_available: bool = True
-    rating: float = 0.0
-    total_reviews: int = 0
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+# Helper functions
+def valid_coordinates(location: Dict[str, Any]) -> bool:
+    # What a 2dsphere index accepts; anything else fails the write with a WriteError
+    try:
+        lat, lng = float(location["lat"]), float(location["lng"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return math.isfinite(lat) and math.isfinite(lng) and -90 <= lat <= 90 and -180 <= lng <= 180
 
-class ItemCreate(BaseModel):
-    title: str
-    description: str
-    category: ItemCategory
-    photos: List[str] = []
-    price_per_day: float
-    price_per_hour: Optional[float] = None
-    location: Dict[str, float]
-    address: str
+# Fast read path: read endpoints hand raw documents to a cached TypeAdapter, which validates
+# them once in pydantic-core and dumps JSON bytes directly, instead of Model(**doc) in the
+# handler followed by a second validation and serialization through response_model
+@functools.lru_cache(maxsize=None)
+def list_adapter(model: type) -> TypeAdapter:
+    return TypeAdapter(List[model])
 
-class Booking(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    item_id: str
-    renter_id: str
-    owner_id: str
-    start_date: datetime
-    end_date: datetime
-    total_amount: float
-    deposit_amount: float
-    status: BookingStatus = BookingStatus.PENDING
-    payment_id: Optional[str] = None  # Mock payment ID
-    damage_photos_before: List[str] = []  # base64 images
-    damage_photos_after: List[str] = []
-    notes: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
-
-class BookingCreate(BaseModel):
-    item_id: str
-    start_date: datetime
-    end_date: datetime
-    notes: Optional[str] = None
-
-class Review(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    booking_id: str
-    reviewer_id: str
-    reviewed_id: str  # Can be user or item
-    reviewed_type: str  # "user" or "item"
-    rating: int = Field(ge=1, le=5)
-    comment: Optional[str] = None
-    photos: List[str] = []  # base64 images
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-
-class ReviewCreate(BaseModel):
-    booking_id: str
-    reviewed_id: str
-    reviewed_type: str
-    rating: int = Field(ge=1, le=5)
-    comment: Optional[str] = None
-    photos: List[str] = []
-
-class Dispute(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    booking_id: str
-    reported_by: str
-    reported_against: str
-    reason: str
-    description: str
-    evidence_photos: List[str] = []  # base64 images
-    status: DisputeStatus = DisputeStatus.OPEN
-    admin_notes: Optional[str] = None
-    resolution: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    resolved_at: Optional[datetime] = None
+def fast_json(model: type, content: Any, exclude: Optional[set] = None) -> Response:
+    if isinstance(content, list):
+        adapter = list_adapter(model)
+        body = adapter.dump_json(
+            adapter.validate_python(content), exclude={"__all__": exclude} if exclude else None
+        )
+    else:
+        body = model.model_validate(content).model_dump_json(exclude=exclude)
+    return Response(content=body, media_type="application/json")
 
-# Helper functions
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+# Conditional GETs: strong ETags from a document's identity and last change
+# no-cache still stores the body but revalidates every use, so an owner or reviewer sees their
+# own write on the next screen and an unchanged body costs only a 304
+ITEM_CACHE_CONTROL = "public, no-cache"
+REVIEWS_CACHE_CONTROL = "public, no-cache"
+PROFILE_CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+def document_etag(document: Dict[str, Any]) -> str:
+    return make_etag(document["id"], document.get("updated_at") or document.get("created_at"))
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    candidates = [candidate.strip().removeprefix("W/") for candidate in header.split(",")]
+    return etag in candidates
+
+def conditional_json(request: Request, etag: str, cache_control: str, model: type, content: Any) -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response = fast_json(model, content)
+    response.headers.update(headers)
+    return response
+
+def to_search_result(item_doc: Dict[str, Any]) -> Dict[str, Any]:
+    if item_doc.get("photos"):
+        item_doc["cover_photo"] = photo_variant_url(item_doc["photos"][0], PhotoVariant.THUMB)
+    return item_doc
 
-def verify_password(password: str, hashed: str) -> bool:
-    return hash_password(password) == hashed
+def item_to_document(item: Item) -> Dict[str, Any]:
+    document = item.dict()
+    document["location"] = to_geojson_point(item.location)
+    return document
+
+# Keyset pagination: sorted by ITEM_SORT_FIELDS, always tie-broken by the unique item id
+# Distances closer than this (km) count as a tie when resuming a $geoNear page
+GEO_CURSOR_EPSILON_KM = 1e-9
+MAX_ITEM_PAGE_SIZE = 100
+
+def encode_cursor(data: Dict[str, Any]) -> str:
+    raw = json.dumps(data, default=lambda value: value.isoformat(), separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return data
+
+def keyset_filter(sort: ItemSort, cursor: Dict[str, Any]) -> Dict[str, Any]:
+    field = ITEM_SORT_FIELDS[sort]
+    if cursor.get("sort") != sort.value or "value" not in cursor or "id" not in cursor:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    value = cursor["value"]
+    try:
+        if not isinstance(cursor["id"], str):
+            raise TypeError(cursor["id"])
+        if sort == ItemSort.NEWEST:
+            value = datetime.fromisoformat(value)
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError(value)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Descending on both keys: strictly after the last (value, id) seen
+    return {"$or": [
+        {field: {"$lt": value}},
+        {field: value, "id": {"$lt": cursor["id"]}},
+    ]}
+
+def geo_cursor(cursor: Dict[str, Any]) -> tuple:
+    """(distance_km, ids already returned at that distance) from a distance-sorted cursor."""
+    if cursor.get("sort") != "distance" or "distance_km" not in cursor:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    distance, seen = cursor["distance_km"], cursor.get("seen", [])
+    if (
+        isinstance(distance, bool) or not isinstance(distance, (int, float)) or distance < 0
+        or not isinstance(seen, list) or not all(isinstance(item_id, str) for item_id in seen)
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return float(distance), seen
+
+# Photo store: content-addressed GridFS files, documents only keep "/api/photos/<sha256>"
+PHOTO_URL_PREFIX = "/api/photos/"
+# Verification documents use the same scheme in a private bucket, see get_document
+DOCUMENT_URL_PREFIX = "/api/documents/"
+FILE_HASH_PATTERN = re.compile(r"[0-9a-f]{64}")
+PHOTO_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+    (b"%PDF", "application/pdf"),
+]
+
+def is_photo_reference(value: str) -> bool:
+    return value.startswith(PHOTO_URL_PREFIX)
+
+def file_store(private: bool) -> tuple:
+    # (bucket, its files collection, URL prefix)
+    if private:
+        return document_bucket, db["documents.files"], DOCUMENT_URL_PREFIX
+    return photo_bucket, db["photos.files"], PHOTO_URL_PREFIX
+
+def detect_content_type(data: bytes) -> str:
+    for signature, content_type in PHOTO_SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+async def store_photo(data: bytes, private: bool = False, wait: bool = False) -> str:
+    """wait: block while the variant render queue is full (bulk migrations) instead of leaving
+    the render to the first variant request."""
+    bucket, files, prefix = file_store(private)
+    photo_hash = hashlib.sha256(data).hexdigest()
+    # Identical uploads share one file
+    if not await files.find_one({"filename": photo_hash}, {"_id": 1}):
+        content_type = detect_content_type(data)
+        await bucket.upload_from_stream(
+            photo_hash, data, metadata={"content_type": content_type}
+        )
+        if content_type in PHOTO_CONTENT_TYPES and not private:
+            if wait:
+                await variant_renderer.put(photo_hash)
+            else:
+                variant_renderer.offer(photo_hash)
+    return prefix + photo_hash
+
+async def store_base64_photo(value: str, private: bool = False, wait: bool = False) -> str:
+    if value.startswith(file_store(private)[2]):
+        return value
+    if value.startswith("data:"):
+        value = value.split(",", 1)[-1]
+    try:
+        data = base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Photos must be base64 encoded")
+    return await store_photo(data, private, wait)
+
+async def store_base64_photos(values: List[str], wait: bool = False) -> List[str]:
+    return [await store_base64_photo(value, wait=wait) for value in values]
+
+# Multipart uploads are copied into GridFS chunk by chunk, never held in memory whole
+UPLOAD_CHUNK_SIZE = 256 * 1024
+MAX_PHOTO_BYTES = 10 * 1024 * 1024
+MAX_DOCUMENT_BYTES = 15 * 1024 * 1024
+MAX_FILES_PER_UPLOAD = 10
+PHOTO_CONTENT_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+DOCUMENT_CONTENT_TYPES = PHOTO_CONTENT_TYPES | {"application/pdf"}
+# Boundaries, part headers and form fields on top of the file bytes
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+# Whole request body per upload route, checked against Content-Length before the form is parsed
+UPLOAD_BODY_LIMITS = {
+    ("POST", "/api/users/verify/upload"): MAX_DOCUMENT_BYTES + MULTIPART_OVERHEAD_BYTES,
+    ("POST", "/api/items/{item_id}/photos"): MAX_FILES_PER_UPLOAD * MAX_PHOTO_BYTES + MULTIPART_OVERHEAD_BYTES,
+    ("POST", "/api/bookings/{booking_id}/damage-photos/upload"):
+        MAX_FILES_PER_UPLOAD * MAX_PHOTO_BYTES + MULTIPART_OVERHEAD_BYTES,
+}
+
+async def store_upload(upload: UploadFile, allowed_types: set, max_bytes: int, private: bool = False) -> str:
+    bucket, files, prefix = file_store(private)
+    first_chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+    content_type = detect_content_type(first_chunk)
+    if content_type not in allowed_types:
+        raise HTTPException(status_code=415, detail=f"Unsupported file type for {upload.filename}")
+    
+    digest = hashlib.sha256()
+    size = 0
+    # The hash is only known at the end, so write under a temporary name and rename
+    grid_in = bucket.open_upload_stream(
+        f"upload-{uuid.uuid4()}", metadata={"content_type": content_type}
+    )
+    try:
+        chunk = first_chunk
+        while chunk:
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"{upload.filename} exceeds {max_bytes // (1024 * 1024)} MB"
+                )
+            digest.update(chunk)
+            await grid_in.write(chunk)
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        await grid_in.abort()
+        raise
+    await grid_in.close()
+    
+    photo_hash = digest.hexdigest()
+    if await files.find_one({"filename": photo_hash}, {"_id": 1}):
+        await bucket.delete(grid_in._id)
+    else:
+        await bucket.rename(grid_in._id, photo_hash)
+        if content_type in PHOTO_CONTENT_TYPES and not private:
+            variant_renderer.offer(photo_hash)
+    return prefix + photo_hash
+
+# Photo variants: resized JPEGs rendered off the event loop on a process pool
+PHOTO_VARIANT_SIZES = {
+    PhotoVariant.FULL: 1600,
+    PhotoVariant.CARD: 600,
+    PhotoVariant.THUMB: 200,
+}
+PHOTO_VARIANT_QUALITY = 82
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", os.cpu_count() or 1))
+# Photo hashes waiting for a render; workers re-read the original, so the queue holds no image bytes
+VARIANT_QUEUE_SIZE = int(os.environ.get("VARIANT_QUEUE_SIZE", 1000))
+image_pool: Optional[ProcessPoolExecutor] = None
+
+def render_photo_variants(data: bytes) -> Dict[str, bytes]:
+    # Runs in a worker process: decode once, then shrink step by step from the largest size
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source).convert("RGB")
+    variants = {}
+    for variant, size in PHOTO_VARIANT_SIZES.items():
+        image.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=PHOTO_VARIANT_QUALITY, optimize=True, progressive=True)
+        variants[variant.value] = buffer.getvalue()
+    return variants
+
+def photo_variant_name(photo_hash: str, variant: PhotoVariant) -> str:
+    return f"{photo_hash}.{variant.value}"
+
+def photo_variant_url(reference: str, variant: PhotoVariant) -> str:
+    if not is_photo_reference(reference):
+        return reference
+    return f"{reference}?variant={variant.value}"
+
+async def generate_photo_variants(photo_hash: str):
+    stream = await photo_bucket.open_download_stream_by_name(photo_hash)
+    data = await stream.read()
+    loop = asyncio.get_running_loop()
+    try:
+        variants = await loop.run_in_executor(image_pool, render_photo_variants, data)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Undecodable despite its signature: remember it so variant requests stop re-queueing it
+        logger.warning("Photo %s cannot be decoded; serving the original for every variant", photo_hash)
+        await db["photos.files"].update_one({"filename": photo_hash}, {"$set": {"metadata.variants_failed": True}})
+        return
+    for variant, variant_data in variants.items():
+        await photo_bucket.upload_from_stream(
+            photo_variant_name(photo_hash, PhotoVariant(variant)),
+            variant_data,
+            metadata={"content_type": "image/jpeg"}
+        )
+
+class VariantRenderer:
+    """Bounded queue of photo hashes, drained by IMAGE_WORKERS tasks feeding the image pool."""
+    
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.pending: set = set()
+        self.workers: List[asyncio.Task] = []
+    
+    def offer(self, photo_hash: str) -> bool:
+        # Request paths never wait: when the queue is full the next variant request offers it again
+        if photo_hash in self.pending:
+            return True
+        try:
+            self.queue.put_nowait(photo_hash)
+        except asyncio.QueueFull:
+            return False
+        self.pending.add(photo_hash)
+        return True
+    
+    async def put(self, photo_hash: str):
+        if photo_hash not in self.pending:
+            self.pending.add(photo_hash)
+            await self.queue.put(photo_hash)
+    
+    async def work(self):
+        while True:
+            photo_hash = await self.queue.get()
+            try:
+                await generate_photo_variants(photo_hash)
+            except Exception:
+                logger.exception("Could not render variants for photo %s", photo_hash)
+            finally:
+                self.pending.discard(photo_hash)
+                self.queue.task_done()
+    
+    def start(self, workers: int):
+        self.workers = [asyncio.create_task(self.work()) for _ in range(workers)]
+    
+    def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+
+variant_renderer = VariantRenderer(VARIANT_QUEUE_SIZE)
+
+async def store_uploads(uploads: List[UploadFile], allowed_types: set, max_bytes: int) -> List[str]:
+    if len(uploads) > MAX_FILES_PER_UPLOAD:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_FILES_PER_UPLOAD} files per upload")
+    return [await store_upload(upload, allowed_types, max_bytes) for upload in uploads]
+
+async def backfill_rating_aggregates() -> Dict[str, int]:
+    updated = {}
+    for reviewed_type in ("user", "item"):
+        target = repos.rating_target(reviewed_type)
+        batch = []
+        count = 0
+        async for total in repos.reviews.rating_totals(reviewed_type):
+            batch.append(total)
+            if len(batch) == 1000:
+                count += await target.set_rating_totals(batch)
+                batch = []
+        count += await target.set_rating_totals(batch)
+        updated[reviewed_type] = count
+    return updated
+
+# Availability: one reservation per (item, day), see BookingRepository.reserve
+# Bookings in these states no longer hold their dates
+RELEASED_BOOKING_STATUSES = {BookingStatus.REJECTED}
+
+def reservation_days(start: datetime, end: datetime) -> List[date]:
+    # Nights booked: the end date is the hand-back day and stays free
+    return [start.date() + timedelta(days=offset) for offset in range((end.date() - start.date()).days)]
+
+async def reserve_dates(item_id: str, booking_id: str, start: datetime, end: datetime):
+    if not await repos.bookings.reserve(item_id, booking_id, reservation_days(start, end)):
+        raise HTTPException(status_code=409, detail="Item is already booked for these dates")
+
+async def release_dates(booking_id: str):
+    await repos.bookings.release(booking_id)
+
+class AvailabilityCalendar:
+    """Owner-blocked days as a bitset: bit i (LSB first) marks origin + i days."""
+    
+    def __init__(self, origin: Optional[date] = None, bits: bytes = b""):
+        self.origin = origin
+        self.bits = bytearray(bits)
+    
+    @classmethod
+    def from_document(cls, document: Optional[Dict[str, Any]]) -> "AvailabilityCalendar":
+        if not document:
+            return cls()
+        return cls(date.fromisoformat(document["origin"]), bytes(document["bits"]))
+    
+    def to_document(self) -> Optional[Dict[str, Any]]:
+        if self.origin is None or not any(self.bits):
+            return None
+        return {"origin": self.origin.isoformat(), "bits": Binary(bytes(self.bits))}
+    
+    def is_blocked(self, day: date) -> bool:
+        if self.origin is None:
+            return False
+        offset = (day - self.origin).days
+        if offset < 0 or offset >= len(self.bits) * 8:
+            return False
+        return bool(self.bits[offset >> 3] & (1 << (offset & 7)))
+    
+    def is_range_free(self, start: date, end: date) -> bool:
+        # end is exclusive, like reservation_days
+        return not any(self.is_blocked(start + timedelta(days=i)) for i in range((end - start).days))
+    
+    def _cover(self, start: date, end: date):
+        if self.origin is None:
+            # Year-aligned origin so the offset of a day is easy to reason about
+            self.origin = date(start.year, 1, 1)
+        if start < self.origin:
+            missing_bytes = -(-(self.origin - start).days // 8)
+            self.bits[:0] = bytes(missing_bytes)
+            self.origin -= timedelta(days=missing_bytes * 8)
+        needed_bytes = -(-(end - self.origin).days // 8)
+        if needed_bytes > len(self.bits):
+            self.bits.extend(bytes(needed_bytes - len(self.bits)))
+    
+    def set_range(self, start: date, end: date, blocked: bool = True):
+        if end <= start:
+            return
+        if blocked:
+            self._cover(start, end)
+        elif self.origin is None:
+            return
+        for i in range((end - start).days):
+            offset = (start - self.origin).days + i
+            if 0 <= offset < len(self.bits) * 8:
+                if blocked:
+                    self.bits[offset >> 3] |= 1 << (offset & 7)
+                else:
+                    self.bits[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+    
+    def trim(self, before: date):
+        # Past days are never queried again; drop whole bytes to keep documents tiny
+        if self.origin is None:
+            return
+        stale_bytes = min(max((before - self.origin).days // 8, 0), len(self.bits))
+        del self.bits[:stale_bytes]
+        self.origin += timedelta(days=stale_bytes * 8)
+        while self.bits and not self.bits[-1]:
+            self.bits.pop()
+    
+    def blocked_ranges(self, start: date, end: date, booked_days: Optional[set] = None) -> List[tuple]:
+        # Contiguous blocked or booked runs within [start, end), as (first_day, last_day)
+        booked_days = booked_days or set()
+        ranges = []
+        run_start = None
+        for i in range((end - start).days + 1):
+            day = start + timedelta(days=i)
+            taken = day < end and (self.is_blocked(day) or day in booked_days)
+            if taken and run_start is None:
+                run_start = day
+            elif not taken and run_start is not None:
+                ranges.append((run_start, day - timedelta(days=1)))
+                run_start = None
+        return ranges
+
+def month_ranges(ranges: List[tuple]) -> Dict[str, List[Dict[str, str]]]:
+    # Split runs at month boundaries, keyed "YYYY-MM"
+    months: Dict[str, List[Dict[str, str]]] = {}
+    for first, last in ranges:
+        while first <= last:
+            next_month = (first.replace(day=1) + timedelta(days=32)).replace(day=1)
+            chunk_end = min(last, next_month - timedelta(days=1))
+            months.setdefault(first.strftime("%Y-%m"), []).append(
+                {"start": first.isoformat(), "end": chunk_end.isoformat()}
+            )
+            first = chunk_end + timedelta(days=1)
+    return months
+
+# Handlers go through repos rather than db; REPOSITORY_BACKEND=memory runs them without MongoDB
+REPOSITORY_BACKEND = os.environ.get("REPOSITORY_BACKEND", "mongo")
+repos = build_repositories(REPOSITORY_BACKEND, db)
+
+# Password hashing: scrypt, with legacy unsalted SHA-256 hex digests upgraded on login
+PASSWORD_SCRYPT_ROUNDS = int(os.environ.get("PASSWORD_SCRYPT_ROUNDS", 15))  # log2 of scrypt N
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+
+def build_password_context(scrypt_rounds: int = PASSWORD_SCRYPT_ROUNDS) -> CryptContext:
+    return CryptContext(
+        schemes=["scrypt", "hex_sha256"],
+        deprecated=["hex_sha256"],
+        scrypt__rounds=scrypt_rounds,
+    )
+
+password_context = build_password_context()
+# hashlib.scrypt releases the GIL, so a small thread pool keeps the KDF off the event loop
+password_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password")
+# Verified against when the email is unknown, so both paths cost the same
+DUMMY_PASSWORD_HASH = password_context.hash(uuid.uuid4().hex)
+
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_pool, password_context.hash, password)
+
+async def verify_password(password: str, hashed: str) -> tuple:
+    # Returns (valid, new_hash); new_hash is set when the stored hash should be replaced
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_pool, password_context.verify_and_update, password, hashed)
 
 def create_access_token(user_id: str) -> str:
     payload = {
@@ -205,19 +568,44 @@ def create_access_token(user_id: str) -> str:
     return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    token_digest = hashlib.sha256(credentials.credentials.encode()).digest()
+    payload = token_cache.get(token_digest)
+    if payload is not None:
+        return payload["user_id"]
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=["HS256"])
+        token_cache.set(token_digest, payload, ttl=payload["exp"] - time.time())
         return payload["user_id"]
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
     except jwt.PyJWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
+async def current_user(user_id: str = Depends(verify_token)) -> CurrentUser:
+    user = user_cache.get(user_id)
+    if user is None:
+        user_doc = await repos.users.get(user_id, ["id", "role", "is_active", "first_name", "last_name"])
+        if not user_doc:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        user = CurrentUser(**user_doc)
+        user_cache.set(user_id, user)
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Account is deactivated")
+    return user
+
+async def active_user_id(user: CurrentUser = Depends(current_user)) -> str:
+    return user.id
+
+async def require_admin(user: CurrentUser = Depends(current_user)) -> str:
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user.id
+
 # Auth endpoints
 @api_router.post("/auth/register", response_model=Dict[str, Any])
 async def register(user_data: UserCreate):
     # Check if user exists
-    existing_user = await db.users.find_one({"email": user_data.email})
+    existing_user = await repos.users.get_by_email(user_data.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -225,12 +613,16 @@ async def register(user_data: UserCreate):
     user = User(
         email=user_data.email,
         phone=user_data.phone,
-        password_hash=hash_password(user_data.password),
+        password_hash=await hash_password(user_data.password),
         first_name=user_data.first_name,
         last_name=user_data.last_name
     )
     
-    await db.users.insert_one(user.dict())
+    try:
+        await repos.users.insert(user.dict())
+    except DuplicateKeyError:
+        # Lost the race against a concurrent registration with the same email
+        raise HTTPException(status_code=400, detail="Email already registered")
     token = create_access_token(user.id)
     
     return {
@@ -241,10 +633,20 @@ async def register(user_data: UserCreate):
 
 @api_router.post("/auth/login", response_model=Dict[str, Any])
 async def login(login_data: UserLogin):
-    user_doc = await db.users.find_one({"email": login_data.email})
-    if not user_doc or not verify_password(login_data.password, user_doc["password_hash"]):
+    user_doc = await repos.users.get_by_email(login_data.email)
+    valid, new_hash = await verify_password(
+        login_data.password, user_doc["password_hash"] if user_doc else DUMMY_PASSWORD_HASH
+    )
+    if not user_doc or not valid:
         raise HTTPException(status_code=400, detail="Invalid credentials")
     
+    if new_hash:
+        # Transparent upgrade of legacy or weaker hashes
+        await repos.users.update(
+            user_doc["id"], {"password_hash": new_hash}, expected={"password_hash": user_doc["password_hash"]}
+        )
+        user_doc["password_hash"] = new_hash
+    
     user = User(**user_doc)
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Account is deactivated")
@@ -257,11 +659,11 @@ async def login(login_data: UserLogin):
     }
 
 @api_router.get("/auth/me", response_model=UserProfile)
-async def get_current_user(user_id: str = Depends(verify_token)):
-    user_doc = await db.users.find_one({"id": user_id})
+async def get_current_user(request: Request, user_id: str = Depends(active_user_id)):
+    user_doc = await repos.users.get(user_id)
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
-    return UserProfile(**user_doc)
+    return conditional_json(request, document_etag(user_doc), PROFILE_CACHE_CONTROL, UserProfile, user_doc)
 
 # User endpoints
 class UserProfileUpdate(BaseModel):
@@ -274,7 +676,7 @@ class UserProfileUpdate(BaseModel):
 @api_router.put("/users/profile", response_model=UserProfile)
 async def update_profile(
     profile_data: UserProfileUpdate,
-    user_id: str = Depends(verify_token)
+    user_id: str = Depends(active_user_id)
 ):
     update_data = {}
     if profile_data.first_name:
@@ -284,48 +686,85 @@ async def update_profile(
     if profile_data.bio is not None:
         update_data["bio"] = profile_data.bio
     if profile_data.profile_photo:
-        update_data["profile_photo"] = profile_data.profile_photo
+        update_data["profile_photo"] = await store_base64_photo(profile_data.profile_photo)
     if profile_data.location:
         update_data["location"] = profile_data.location
     
-    await db.users.update_one({"id": user_id}, {"$set": update_data})
+    if update_data:
+        update_data["updated_at"] = datetime.utcnow()
     
-    user_doc = await db.users.find_one({"id": user_id})
+    if not update_data:
+        user_doc = await repos.users.get(user_id)
+    else:
+        user_doc = await repos.users.update_and_get(user_id, update_data)
+        user_cache.invalidate(user_id)
     return UserProfile(**user_doc)
 
 @api_router.post("/users/verify", response_model=Dict[str, str])
 async def submit_verification(
     verification_document: str,
-    user_id: str = Depends(verify_token)
+    user_id: str = Depends(active_user_id)
+):
+    await repos.users.update(user_id, {
+        "verification_document": await store_base64_photo(verification_document, private=True),
+        "is_verified": False,
+        "updated_at": datetime.utcnow()
+    })
+    user_cache.invalidate(user_id)
+    return {"message": "Verification document submitted successfully"}
+
+@api_router.post("/users/verify/upload", response_model=Dict[str, str])
+async def upload_verification_document(
+    document: UploadFile = File(...),
+    user_id: str = Depends(active_user_id)
 ):
-    await db.users.update_one(
-        {"id": user_id},
-        {"$set": {"verification_document": verification_document, "is_verified": False}}
+    reference = await store_upload(document, DOCUMENT_CONTENT_TYPES, MAX_DOCUMENT_BYTES, private=True)
+    await repos.users.update(
+        user_id, {"verification_document": reference, "is_verified": False, "updated_at": datetime.utcnow()}
     )
+    user_cache.invalidate(user_id)
     return {"message": "Verification document submitted successfully"}
 
 # Item endpoints
+@api_router.post("/items/{item_id}/photos", response_model=List[str])
+async def upload_item_photos(
+    item_id: str,
+    files: List[UploadFile] = File(...),
+    user_id: str = Depends(active_user_id)
+):
+    item_doc = await repos.items.get(item_id, ["owner_id"])
+    if not item_doc:
+        raise HTTPException(status_code=404, detail="Item not found")
+    if item_doc["owner_id"] != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    references = await store_uploads(files, PHOTO_CONTENT_TYPES, MAX_PHOTO_BYTES)
+    await repos.items.append(item_id, "photos", references, {"updated_at": datetime.utcnow()})
+    invalidate_item_queries()
+    return references
+
 @api_router.post("/items", response_model=Item)
-async def create_item(item_data: ItemCreate, user_id: str = Depends(verify_token)):
+async def create_item(item_data: ItemCreate, user_id: str = Depends(active_user_id)):
+    if "lat" not in item_data.location or "lng" not in item_data.location:
+        raise HTTPException(status_code=400, detail="Location must include lat and lng")
+    if not valid_coordinates(item_data.location):
+        raise HTTPException(status_code=400, detail="Location must have lat within ±90 and lng within ±180")
+    
     item = Item(
         owner_id=user_id,
         **item_data.dict()
     )
-    await db.items.insert_one(item.dict())
+    item.photos = await store_base64_photos(item.photos)
+    await repos.items.insert(item_to_document(item))
+    invalidate_item_queries()
     return item
 
-@api_router.get("/items", response_model=List[Item])
-async def get_items(
+def build_item_filter(
     category: Optional[ItemCategory] = None,
     search: Optional[str] = None,
-    lat: Optional[float] = None,
-    lng: Optional[float] = None,
-    max_distance: Optional[float] = 50,  # km
     min_price: Optional[float] = None,
-    max_price: Optional[float] = None,
-    limit: int = 20,
-    skip: int = 0
-):
+    max_price: Optional[float] = None
+) -> Dict[str, Any]:
     filter_query = {"is_available": True}
     
     if category:
@@ -345,26 +784,195 @@ async def get_items(
             price_filter["$lte"] = max_price
         filter_query["price_per_day"] = price_filter
     
-    items = await db.items.find(filter_query).skip(skip).limit(limit).to_list(limit)
-    return [Item(**item) for item in items]
+    return filter_query
+
+# Identical searches (HomeScreen's ?limit=10, popular category filters) share cached pages
+item_query_cache = TTLCache(
+    "items",
+    maxsize=int(os.environ.get("ITEM_CACHE_SIZE", 2000)),
+    ttl=float(os.environ.get("ITEM_CACHE_TTL", 15)),
+    # Entries are rendered pages, so the total body size is bounded as well as the entry count
+    maxbytes=int(os.environ.get("ITEM_CACHE_BYTES", 64 * 1024 * 1024))
+)
+
+def invalidate_item_queries():
+    # Conservative: any listing change drops every cached page in this process
+    item_query_cache.clear()
+    facet_cache.clear()
+
+@api_router.get("/items", response_model=List[ItemSearchResult], response_model_exclude={"photos"})
+async def get_items(
+    category: Optional[ItemCategory] = None,
+    search: Optional[str] = None,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    max_distance: Optional[float] = 50,  # km
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    limit: int = Query(20, ge=1, le=MAX_ITEM_PAGE_SIZE),
+    skip: int = Query(0, ge=0),  # deprecated, use cursor
+    cursor: Optional[str] = None,
+    sort: ItemSort = ItemSort.NEWEST
+):
+    search = search.strip() or None if search else None
+    geo = (lat, lng, max_distance) if lat is not None and lng is not None else None
+    cache_key = (category, search, geo, min_price or None, max_price or None, limit, skip, cursor, sort)
+    body, next_cursor = await item_query_cache.get_or_load(cache_key, lambda: query_items(
+        category, search, lat, lng, max_distance, min_price, max_price, limit, skip, cursor, sort
+    ))
+    response = Response(content=body, media_type="application/json")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+async def query_items(
+    category: Optional[ItemCategory],
+    search: Optional[str],
+    lat: Optional[float],
+    lng: Optional[float],
+    max_distance: Optional[float],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    limit: int,
+    skip: int,
+    cursor: Optional[str],
+    sort: ItemSort
+) -> tuple:
+    if cursor and skip:
+        raise HTTPException(status_code=400, detail="Use either cursor or skip, not both")
+    
+    filter_query = build_item_filter(category, search, min_price, max_price)
+    
+    cursor_data = decode_cursor(cursor) if cursor else None
+    next_cursor = None
+    
+    if lat is not None and lng is not None:
+        cursor_distance, seen = geo_cursor(cursor_data) if cursor_data else (None, [])
+        # Resume at the last distance and drop the items already returned at that distance
+        min_distance = max(cursor_distance - GEO_CURSOR_EPSILON_KM, 0) if cursor_data else 0
+        items = await repos.items.search_near(
+            filter_query, lat, lng, max_distance, skip, limit, min_distance=min_distance, exclude_ids=seen
+        )
+        
+        if items and len(items) == limit:
+            last_distance = items[-1]["distance_km"]
+            # $geoNear orders ties arbitrarily, so a tie group longer than a page keeps
+            # every id returned so far at that distance, not just this page's
+            if cursor_data and abs(last_distance - cursor_distance) <= GEO_CURSOR_EPSILON_KM:
+                tied = list(seen)
+            else:
+                tied = []
+            tied += [
+                item["id"] for item in items
+                if abs(item["distance_km"] - last_distance) <= GEO_CURSOR_EPSILON_KM
+            ]
+            next_cursor = encode_cursor({"sort": "distance", "distance_km": last_distance, "seen": tied})
+    else:
+        field = ITEM_SORT_FIELDS[sort]
+        query = filter_query
+        if cursor_data:
+            query = {"$and": [filter_query, keyset_filter(sort, cursor_data)]}
+        items = await repos.items.search(query, sort, skip, limit)
+        
+        if items and len(items) == limit:
+            next_cursor = encode_cursor({
+                "sort": sort.value,
+                "value": items[-1][field],
+                "id": items[-1]["id"],
+            })
+    response = fast_json(ItemSearchResult, [to_search_result(item) for item in items], exclude={"photos"})
+    return response.body, next_cursor
+
+MAX_BATCH_IDS = 300
+
+@api_router.get("/items/batch", response_model=List[Item])
+async def get_items_batch(ids: List[str] = Query(...)):
+    # Accepts ?ids=a,b,c as well as repeated ?ids=a&ids=b
+    item_ids = [item_id for value in ids for item_id in value.split(",") if item_id]
+    if len(item_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    
+    unique_ids = list(dict.fromkeys(item_ids))
+    items = await repos.items.get_many(unique_ids)
+    items_by_id = {item["id"]: item for item in items}
+    # Requested order; unknown ids are skipped
+    return fast_json(Item, [items_by_id[item_id] for item_id in unique_ids if item_id in items_by_id])
 
 @api_router.get("/items/{item_id}", response_model=Item)
-async def get_item(item_id: str):
-    item_doc = await db.items.find_one({"id": item_id})
+async def get_item(item_id: str, request: Request):
+    item_doc = await repos.items.get(item_id)
     if not item_doc:
         raise HTTPException(status_code=404, detail="Item not found")
-    return Item(**item_doc)
+    return conditional_json(request, document_etag(item_doc), ITEM_CACHE_CONTROL, Item, item_doc)
+
+class AvailabilityUpdate(BaseModel):
+    start_date: date
+    end_date: date  # exclusive
+    blocked: bool = True
+
+@api_router.get("/items/{item_id}/availability", response_model=Dict[str, List[Dict[str, str]]])
+async def get_item_availability(item_id: str, start_month: Optional[str] = None, months: int = 3):
+    item_doc = await repos.items.get(item_id, ["availability"])
+    if not item_doc:
+        raise HTTPException(status_code=404, detail="Item not found")
+    
+    try:
+        start = datetime.strptime(start_month, "%Y-%m").date() if start_month else date.today().replace(day=1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start_month must be YYYY-MM")
+    months = min(max(months, 1), 12)
+    end = start
+    for _ in range(months):
+        end = (end + timedelta(days=32)).replace(day=1)
+    
+    booked_days = await repos.bookings.reserved_days(item_id, start, end)
+    
+    calendar = AvailabilityCalendar.from_document(item_doc.get("availability"))
+    return month_ranges(calendar.blocked_ranges(start, end, booked_days))
+
+@api_router.put("/items/{item_id}/availability", response_model=Dict[str, str])
+async def update_item_availability(
+    item_id: str,
+    availability_update: AvailabilityUpdate,
+    user_id: str = Depends(active_user_id)
+):
+    if availability_update.end_date <= availability_update.start_date:
+        raise HTTPException(status_code=400, detail="Invalid date range")
+    
+    # Compare-and-set on the previous bitmap so concurrent edits are not lost
+    for _ in range(3):
+        item_doc = await repos.items.get(item_id, ["owner_id", "availability"])
+        if not item_doc:
+            raise HTTPException(status_code=404, detail="Item not found")
+        if item_doc["owner_id"] != user_id:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        
+        calendar = AvailabilityCalendar.from_document(item_doc.get("availability"))
+        calendar.set_range(
+            availability_update.start_date, availability_update.end_date, availability_update.blocked
+        )
+        calendar.trim(before=date.today())
+        
+        updated = await repos.items.update(
+            item_id,
+            {"availability": calendar.to_document(), "updated_at": datetime.utcnow()},
+            expected={"availability": item_doc.get("availability")}
+        )
+        if updated:
+            invalidate_item_queries()
+            return {"message": "Availability updated successfully"}
+    raise HTTPException(status_code=409, detail="Availability changed concurrently, please retry")
 
 @api_router.get("/items/user/my-items", response_model=List[Item])
-async def get_my_items(user_id: str = Depends(verify_token)):
-    items = await db.items.find({"owner_id": user_id}).to_list(100)
-    return [Item(**item) for item in items]
+async def get_my_items(user_id: str = Depends(active_user_id)):
+    items = await repos.items.list_by_owner(user_id)
+    return fast_json(Item, items)
 
 # Booking endpoints
 @api_router.post("/bookings", response_model=Booking)
-async def create_booking(booking_data: BookingCreate, user_id: str = Depends(verify_token)):
+async def create_booking(booking_data: BookingCreate, user_id: str = Depends(active_user_id)):
     # Get item details
-    item_doc = await db.items.find_one({"id": booking_data.item_id})
+    item_doc = await repos.items.get(booking_data.item_id)
     if not item_doc:
         raise HTTPException(status_code=404, detail="Item not found")
     
@@ -375,6 +983,10 @@ async def create_booking(booking_data: BookingCreate, user_id: str = Depends(ver
     if days <= 0:
         raise HTTPException(status_code=400, detail="Invalid date range")
     
+    calendar = AvailabilityCalendar.from_document(item_doc.get("availability"))
+    if not calendar.is_range_free(booking_data.start_date.date(), booking_data.end_date.date()):
+        raise HTTPException(status_code=409, detail="Item is not available for these dates")
+    
     total_amount = item.price_per_day * days
     deposit_amount = total_amount * 0.2  # 20% deposit
     
@@ -390,18 +1002,49 @@ async def create_booking(booking_data: BookingCreate, user_id: str = Depends(ver
         payment_id=f"mock_payment_{uuid.uuid4()}"  # Mock payment
     )
     
-    await db.bookings.insert_one(booking.dict())
+    await reserve_dates(booking.item_id, booking.id, booking.start_date, booking.end_date)
+    try:
+        await repos.bookings.insert(booking.dict())
+    except Exception:
+        await release_dates(booking.id)
+        raise
     return booking
 
-@api_router.get("/bookings/my-bookings", response_model=List[Booking])
-async def get_my_bookings(user_id: str = Depends(verify_token)):
-    bookings = await db.bookings.find({
-        "$or": [
-            {"renter_id": user_id},
-            {"owner_id": user_id}
-        ]
-    }).to_list(100)
-    return [Booking(**booking) for booking in bookings]
+class BookingItemSummary(BaseModel):
+    id: str
+    title: str
+    category: ItemCategory
+    address: str
+    price_per_day: float
+    cover_photo: Optional[str] = None
+
+class BookingCounterparty(BaseModel):
+    id: str
+    first_name: str
+    last_name: str
+    rating: float = 0.0
+
+class BookingExpanded(Booking):
+    item: Optional[BookingItemSummary] = None
+    counterparty: Optional[BookingCounterparty] = None
+
+BOOKING_EXPANSIONS = {"item", "counterparty"}
+
+@api_router.get("/bookings/my-bookings", response_model=List[BookingExpanded])
+async def get_my_bookings(expand: Optional[str] = None, user_id: str = Depends(active_user_id)):
+    expansions = set(expand.split(",")) if expand else set()
+    if expansions - BOOKING_EXPANSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"expand accepts: {', '.join(sorted(BOOKING_EXPANSIONS))}"
+        )
+    
+    bookings = await repos.bookings.list_for_user(user_id, expansions)
+    for booking in bookings:
+        cover_photo = (booking.get("item") or {}).get("cover_photo")
+        if cover_photo:
+            booking["item"]["cover_photo"] = photo_variant_url(cover_photo, PhotoVariant.THUMB)
+    return fast_json(BookingExpanded, bookings)
 
 class BookingStatusUpdate(BaseModel):
     status: BookingStatus
@@ -410,9 +1053,9 @@ class BookingStatusUpdate(BaseModel):
 async def update_booking_status(
     booking_id: str,
     status_update: BookingStatusUpdate,
-    user_id: str = Depends(verify_token)
+    user_id: str = Depends(active_user_id)
 ):
-    booking_doc = await db.bookings.find_one({"id": booking_id})
+    booking_doc = await repos.bookings.get(booking_id)
     if not booking_doc:
         raise HTTPException(status_code=404, detail="Booking not found")
     
@@ -426,12 +1069,20 @@ async def update_booking_status(
     if status_update.status in [BookingStatus.APPROVED, BookingStatus.REJECTED] and booking.owner_id != user_id:
         raise HTTPException(status_code=403, detail="Only owner can approve/reject bookings")
     
-    await db.bookings.update_one(
-        {"id": booking_id},
-        {"$set": {"status": status_update.status, "updated_at": datetime.utcnow()}}
+    # Released dates may already belong to another booking, so a rejected booking stays rejected
+    if booking.status in RELEASED_BOOKING_STATUSES and status_update.status not in RELEASED_BOOKING_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Booking is {booking.status.value} and cannot be reopened")
+    
+    # Compare-and-set on the status read above, so a concurrent reject cannot be overwritten
+    updated_booking = await repos.bookings.update_and_get(
+        booking_id, {"status": status_update.status, "updated_at": datetime.utcnow()}, {"status": booking.status.value}
     )
+    if not updated_booking:
+        raise HTTPException(status_code=409, detail="Booking status changed concurrently, retry")
+    
+    if status_update.status in RELEASED_BOOKING_STATUSES:
+        await release_dates(booking_id)
     
-    updated_booking = await db.bookings.find_one({"id": booking_id})
     return Booking(**updated_booking)
 
 class DamagePhotosUpload(BaseModel):
@@ -442,9 +1093,9 @@ class DamagePhotosUpload(BaseModel):
 async def upload_damage_photos(
     booking_id: str,
     damage_data: DamagePhotosUpload,
-    user_id: str = Depends(verify_token)
+    user_id: str = Depends(active_user_id)
 ):
-    booking_doc = await db.bookings.find_one({"id": booking_id})
+    booking_doc = await repos.bookings.get(booking_id)
     if not booking_doc:
         raise HTTPException(status_code=404, detail="Booking not found")
     
@@ -455,18 +1106,39 @@ async def upload_damage_photos(
     
     field_name = "damage_photos_before" if damage_data.photo_type == "before" else "damage_photos_after"
     
-    await db.bookings.update_one(
-        {"id": booking_id},
-        {"$set": {field_name: damage_data.photos, "updated_at": datetime.utcnow()}}
-    )
+    await repos.bookings.update_and_get(booking_id, {
+        field_name: await store_base64_photos(damage_data.photos),
+        "updated_at": datetime.utcnow()
+    })
     
     return {"message": f"Damage photos ({damage_data.photo_type}) uploaded successfully"}
 
+@api_router.post("/bookings/{booking_id}/damage-photos/upload", response_model=List[str])
+async def upload_damage_photo_files(
+    booking_id: str,
+    photo_type: str = Form(...),  # "before" or "after"
+    files: List[UploadFile] = File(...),
+    user_id: str = Depends(active_user_id)
+):
+    booking_doc = await repos.bookings.get(booking_id, ["renter_id", "owner_id"])
+    if not booking_doc:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    
+    if booking_doc["renter_id"] != user_id and booking_doc["owner_id"] != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    field_name = "damage_photos_before" if photo_type == "before" else "damage_photos_after"
+    
+    # Appends, so large batches can be sent in several requests
+    references = await store_uploads(files, PHOTO_CONTENT_TYPES, MAX_PHOTO_BYTES)
+    await repos.bookings.append(booking_id, field_name, references, {"updated_at": datetime.utcnow()})
+    return references
+
 # Review endpoints
 @api_router.post("/reviews", response_model=Review)
-async def create_review(review_data: ReviewCreate, user_id: str = Depends(verify_token)):
+async def create_review(review_data: ReviewCreate, user_id: str = Depends(active_user_id)):
     # Verify booking exists and user is involved
-    booking_doc = await db.bookings.find_one({"id": review_data.booking_id})
+    booking_doc = await repos.bookings.get(review_data.booking_id)
     if not booking_doc:
         raise HTTPException(status_code=404, detail="Booking not found")
     
@@ -478,49 +1150,129 @@ async def create_review(review_data: ReviewCreate, user_id: str = Depends(verify
         reviewer_id=user_id,
         **review_data.dict()
     )
+    review.photos = await store_base64_photos(review.photos)
     
-    await db.reviews.insert_one(review.dict())
+    await repos.reviews.insert(review.dict())
     
     # Update average rating
-    if review_data.reviewed_type == "user":
-        reviews = await db.reviews.find({
-            "reviewed_id": review_data.reviewed_id,
-            "reviewed_type": "user"
-        }).to_list(1000)
-        
-        avg_rating = sum(r["rating"] for r in reviews) / len(reviews)
-        await db.users.update_one(
-            {"id": review_data.reviewed_id},
-            {"$set": {"rating": avg_rating, "total_reviews": len(reviews)}}
-        )
-    
-    elif review_data.reviewed_type == "item":
-        reviews = await db.reviews.find({
-            "reviewed_id": review_data.reviewed_id,
-            "reviewed_type": "item"
-        }).to_list(1000)
-        
-        avg_rating = sum(r["rating"] for r in reviews) / len(reviews)
-        await db.items.update_one(
-            {"id": review_data.reviewed_id},
-            {"$set": {"rating": avg_rating, "total_reviews": len(reviews)}}
-        )
+    target = repos.rating_target(review_data.reviewed_type)
+    if target is not None:
+        await target.add_rating(review_data.reviewed_id, review_data.rating)
     
     return review
 
 @api_router.get("/reviews/{reviewed_id}", response_model=List[Review])
-async def get_reviews(reviewed_id: str, reviewed_type: str):
-    reviews = await db.reviews.find({
-        "reviewed_id": reviewed_id,
-        "reviewed_type": reviewed_type
-    }).to_list(100)
-    return [Review(**review) for review in reviews]
+async def get_reviews(reviewed_id: str, reviewed_type: str, request: Request):
+    reviews = await repos.reviews.list_for(reviewed_id, reviewed_type)
+    # Reviews are only rewritten by migrations (which set updated_at), so ids identify the list
+    etag = make_etag(
+        reviewed_type, reviewed_id, *(f"{review['id']}@{review.get('updated_at', '')}" for review in reviews)
+    )
+    return conditional_json(request, etag, REVIEWS_CACHE_CONTROL, Review, reviews)
 
 # Search and discovery
-@api_router.get("/search/popular", response_model=List[Item])
-async def get_popular_items(limit: int = 10):
-    items = await db.items.find({"is_available": True}).sort("rating", -1).limit(limit).to_list(limit)
-    return [Item(**item) for item in items]
+# Popular feed: top items per category, precomputed in the background and served from memory
+POPULAR_FEED_SIZE = int(os.environ.get("POPULAR_FEED_SIZE", 50))
+POPULAR_REFRESH_SECONDS = float(os.environ.get("POPULAR_REFRESH_SECONDS", 300))
+# Bayesian average prior: an item counts as having this many extra reviews at the global mean
+POPULAR_PRIOR_WEIGHT = float(os.environ.get("POPULAR_PRIOR_WEIGHT", 5))
+
+# Feed key -> pre-rendered JSON of each item, so a request only joins a slice
+popular_snapshot: Dict[str, List[bytes]] = {}
+
+def render_popular_feed(items: List[Dict[str, Any]]) -> List[bytes]:
+    return [
+        ItemSearchResult.model_validate(to_search_result(item)).model_dump_json(exclude={"photos"}).encode()
+        for item in items
+    ]
+
+async def refresh_popular_feeds():
+    feeds = await repos.items.popular_feeds(POPULAR_FEED_SIZE, POPULAR_PRIOR_WEIGHT)
+    for key, items in feeds.items():
+        popular_snapshot[key] = render_popular_feed(items)
+    await repos.items.store_popular_feeds(feeds)
+
+async def load_popular_feeds():
+    for key, items in (await repos.items.load_popular_feeds()).items():
+        popular_snapshot[key] = render_popular_feed(items)
+
+async def popular_feed_loop():
+    try:
+        await load_popular_feeds()
+    except Exception:
+        logger.exception("Could not load stored popular feeds")
+    while True:
+        try:
+            await refresh_popular_feeds()
+        except Exception:
+            logger.exception("Popular feed refresh failed")
+        await asyncio.sleep(POPULAR_REFRESH_SECONDS)
+
+@api_router.get("/search/popular", response_model=List[ItemSearchResult], response_model_exclude={"photos"})
+async def get_popular_items(limit: int = 10, category: Optional[ItemCategory] = None):
+    feed = popular_snapshot.get(category.value if category else POPULAR_ALL)
+    if feed is not None and limit <= POPULAR_FEED_SIZE:
+        return Response(content=b"[" + b",".join(feed[:max(limit, 0)]) + b"]", media_type="application/json")
+    
+    # No snapshot yet (first refresh still running) or a larger page than the feed holds
+    items = await repos.items.top_rated(limit, category)
+    return fast_json(ItemSearchResult, [to_search_result(item) for item in items], exclude={"photos"})
+
+# Facets: category counts and a price histogram for the current filter, cached briefly
+facet_cache = TTLCache("facets", maxsize=1000, ttl=float(os.environ.get("FACET_CACHE_TTL", 30)))
+
+class PriceBucket(BaseModel):
+    min: float
+    max: Optional[float] = None  # None for the open-ended top bucket
+    count: int
+
+class SearchFacets(BaseModel):
+    total: int
+    categories: Dict[str, int]
+    price_histogram: List[PriceBucket]
+
+@api_router.get("/search/facets", response_model=SearchFacets)
+async def get_search_facets(
+    category: Optional[ItemCategory] = None,
+    search: Optional[str] = None,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    max_distance: Optional[float] = 50,  # km
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None
+):
+    search = search.strip().lower() if search else None
+    geo = (round(lat, 3), round(lng, 3), max_distance) if lat is not None and lng is not None else None
+    cache_key = (category, search or None, min_price or None, max_price or None, geo)
+    return await facet_cache.get_or_load(
+        cache_key, lambda: compute_search_facets(category, search, min_price, max_price, geo)
+    )
+
+async def compute_search_facets(
+    category: Optional[ItemCategory],
+    search: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    geo: Optional[tuple]
+) -> SearchFacets:
+    # Category counts ignore the selected category so the other options keep their numbers
+    base_filter = build_item_filter(None, search, min_price, max_price)
+    result = await repos.items.facets(base_filter, category, geo)
+    
+    counts = result["prices"]
+    price_histogram = [
+        PriceBucket(min=low, max=high, count=counts.get(low, 0))
+        for low, high in zip(PRICE_HISTOGRAM_BOUNDARIES, PRICE_HISTOGRAM_BOUNDARIES[1:])
+    ]
+    price_histogram.append(PriceBucket(min=PRICE_HISTOGRAM_BOUNDARIES[-1], count=counts.get("top", 0)))
+    
+    category_counts = result["categories"]
+    facets = SearchFacets(
+        total=result["total"],
+        categories={category.value: category_counts.get(category.value, 0) for category in ItemCategory},
+        price_histogram=price_histogram,
+    )
+    return facets
 
 @api_router.get("/categories", response_model=List[str])
 async def get_categories():
@@ -534,7 +1286,7 @@ class PaymentRequest(BaseModel):
 @api_router.post("/payments/process", response_model=Dict[str, Any])
 async def process_payment(
     payment_data: PaymentRequest,
-    user_id: str = Depends(verify_token)
+    user_id: str = Depends(active_user_id)
 ):
     # Mock payment processing
     payment_id = f"iyzico_mock_{uuid.uuid4()}"
@@ -546,6 +1298,117 @@ async def process_payment(
         "booking_id": payment_data.booking_id
     }
 
+# Photo endpoints
+@api_router.get("/photos/{photo_hash}")
+async def get_photo(photo_hash: str, variant: Optional[PhotoVariant] = None):
+    # Only finished sha256 names; temporary upload-<uuid> files are never served
+    if not FILE_HASH_PATTERN.fullmatch(photo_hash):
+        raise HTTPException(status_code=404, detail="Photo not found")
+    # Content-addressed, so the bytes behind a hash (and its variants) never change
+    cache_control = "public, max-age=31536000, immutable"
+    etag = photo_hash
+    stream = None
+    if variant:
+        try:
+            stream = await photo_bucket.open_download_stream_by_name(photo_variant_name(photo_hash, variant))
+            etag = photo_variant_name(photo_hash, variant)
+        except NoFile:
+            pass
+    if stream is None:
+        try:
+            stream = await photo_bucket.open_download_stream_by_name(photo_hash)
+        except NoFile:
+            raise HTTPException(status_code=404, detail="Photo not found")
+        metadata = stream.metadata or {}
+        if variant and metadata.get("content_type") in PHOTO_CONTENT_TYPES and not metadata.get("variants_failed"):
+            # Not rendered yet (or stored before variants existed): serve the original for now
+            variant_renderer.offer(photo_hash)
+            cache_control = "no-cache"
+    return stream_grid_file(stream, {"Cache-Control": cache_control, "ETag": f'"{etag}"'})
+
+@api_router.get("/documents/{document_hash}")
+async def get_document(document_hash: str, user: CurrentUser = Depends(current_user)):
+    if not FILE_HASH_PATTERN.fullmatch(document_hash):
+        raise HTTPException(status_code=404, detail="Document not found")
+    # Verification documents: only the user who submitted one and admins may fetch it
+    if user.role != UserRole.ADMIN:
+        owner_doc = await repos.users.get(user.id, ["verification_document"])
+        if not owner_doc or owner_doc.get("verification_document") != DOCUMENT_URL_PREFIX + document_hash:
+            raise HTTPException(status_code=404, detail="Document not found")
+    try:
+        stream = await document_bucket.open_download_stream_by_name(document_hash)
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return stream_grid_file(stream, {"Cache-Control": "private, no-store"})
+
+def stream_grid_file(stream, headers: Dict[str, str]) -> StreamingResponse:
+    async def iter_chunks():
+        while True:
+            chunk = await stream.readchunk()
+            if not chunk:
+                break
+            yield chunk
+    
+    metadata = stream.metadata or {}
+    return StreamingResponse(
+        iter_chunks(),
+        media_type=metadata.get("content_type", "application/octet-stream"),
+        headers={"Content-Length": str(stream.length), **headers}
+    )
+
+# Admin endpoints
+@api_router.get("/admin/indexes", response_model=Dict[str, Dict[str, List[str]]])
+async def get_index_report(user_id: str = Depends(require_admin)):
+    return await report_indexes()
+
+@api_router.post("/admin/backfill-ratings", response_model=Dict[str, int])
+async def backfill_ratings(user_id: str = Depends(require_admin)):
+    return await backfill_rating_aggregates()
+
+@api_router.post("/admin/users/{target_user_id}/deactivate", response_model=Dict[str, str])
+async def deactivate_user(target_user_id: str, user_id: str = Depends(require_admin)):
+    if not await repos.users.update(target_user_id, {"is_active": False, "updated_at": datetime.utcnow()}):
+        raise HTTPException(status_code=404, detail="User not found")
+    user_cache.invalidate(target_user_id)
+    return {"message": "User deactivated"}
+
+@api_router.get("/admin/caches", response_model=Dict[str, Dict[str, Any]])
+async def get_cache_stats(user_id: str = Depends(require_admin)):
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
+# Upload size limits
+class UploadLimitMiddleware:
+    """Refuses oversized uploads from Content-Length, before Starlette spools the multipart body to disk.
+    Upload routes require Content-Length; the server's HTTP framing keeps the body from exceeding it."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        limit = UPLOAD_BODY_LIMITS.get((scope.get("method"), request_route.get())) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is None or not content_length.isdigit():
+            response = ORJSONResponse({"detail": "Content-Length required for uploads"}, status_code=411)
+        elif int(content_length) > limit:
+            response = ORJSONResponse(
+                {"detail": f"Upload exceeds {limit // (1024 * 1024)} MB"},
+                status_code=413,
+                headers={"Connection": "close"}
+            )
+        else:
+            await self.app(scope, receive, send)
+            return
+        await response(scope, receive, send)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    lines = [line for metric in METRICS for line in metric.render()]
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -555,8 +1418,15 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Inside MetricsMiddleware, which sets request_route
+app.add_middleware(UploadLimitMiddleware)
+app.add_middleware(CompressionMiddleware)
+# Outermost, so latency and size include compression
+app.add_middleware(MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -564,6 +1434,232 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def migrate_item_locations():
+    # Convert legacy {"lat", "lng"} locations to GeoJSON so the 2dsphere index can cover them
+    legacy = db.items.find({"location.type": {"$ne": "Point"}}, {"id": 1, "location": 1})
+    async for item_doc in legacy:
+        location = item_doc.get("location") or {}
+        if not valid_coordinates(location):
+            logger.warning("Item %s has no usable location, skipping", item_doc.get("id"))
+            continue
+        await db.items.update_one(
+            {"_id": item_doc["_id"]},
+            {"$set": {"location": to_geojson_point(location)}}
+        )
+
+# Indexes backing every query the API issues, keyed by collection
+INDEX_SPECS: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "items": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("location", "2dsphere")], name="location_2dsphere"),
+        IndexModel([("owner_id", ASCENDING)], name="owner_id"),
+        IndexModel(
+            [("is_available", ASCENDING), ("category", ASCENDING), ("price_per_day", ASCENDING)],
+            name="available_category_price"
+        ),
+        # Keyset pagination orders for get_items (and get_popular_items)
+        IndexModel(
+            [("is_available", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="available_created_id"
+        ),
+        IndexModel(
+            [("is_available", ASCENDING), ("rating", DESCENDING), ("id", DESCENDING)],
+            name="available_rating_id"
+        ),
+    ],
+    "bookings": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # One index per $or branch in get_my_bookings
+        IndexModel([("renter_id", ASCENDING)], name="renter_id"),
+        IndexModel([("owner_id", ASCENDING)], name="owner_id"),
+        IndexModel([("item_id", ASCENDING)], name="item_id"),
+    ],
+    "reservations": [
+        IndexModel([("booking_id", ASCENDING)], name="booking_id"),
+        IndexModel([("item_id", ASCENDING), ("day", ASCENDING)], name="item_day"),
+    ],
+    "reviews": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("reviewed_id", ASCENDING), ("reviewed_type", ASCENDING)], name="reviewed"),
+    ],
+    "disputes": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+}
+
+async def ensure_indexes():
+    for collection_name, indexes in INDEX_SPECS.items():
+        for index in indexes:
+            try:
+                await db[collection_name].create_indexes([index])
+            except OperationFailure as e:
+                # e.g. duplicate emails blocking a unique index; keep starting up and report it
+                logger.error("Could not create index %s.%s: %s", collection_name, index.document["name"], e)
+
+async def report_indexes() -> Dict[str, Dict[str, List[str]]]:
+    report = {}
+    for collection_name, indexes in INDEX_SPECS.items():
+        existing = await db[collection_name].index_information()
+        expected = [index.document["name"] for index in indexes]
+        report[collection_name] = {
+            "present": [name for name in expected if name in existing],
+            "missing": [name for name in expected if name not in existing],
+            "extra": [name for name in existing if name != "_id_" and name not in expected],
+        }
+    return report
+
+# Inline base64 fields moved to the photo store, per collection
+PHOTO_FIELDS = {
+    # verification_document goes to the private bucket, see migrate_verification_documents
+    "users": {"list": [], "single": ["profile_photo"]},
+    "items": {"list": ["photos"], "single": []},
+    "bookings": {"list": ["damage_photos_before", "damage_photos_after"], "single": []},
+    "reviews": {"list": ["photos"], "single": []},
+    "disputes": {"list": ["evidence_photos"], "single": []},
+}
+
+async def migrate_inline_photos():
+    inline = {"$not": {"$regex": f"^{PHOTO_URL_PREFIX}"}}
+    for collection_name, fields in PHOTO_FIELDS.items():
+        conditions = [{field: {"$elemMatch": inline}} for field in fields["list"]]
+        conditions += [{field: {"$type": "string", **inline}} for field in fields["single"]]
+        projection = {field: 1 for field in fields["list"] + fields["single"]}
+        migrated = 0
+        async for doc in db[collection_name].find({"$or": conditions}, projection):
+            update = {}
+            try:
+                for field in fields["list"]:
+                    if doc.get(field):
+                        update[field] = await store_base64_photos(doc[field], wait=True)
+                for field in fields["single"]:
+                    if doc.get(field):
+                        update[field] = await store_base64_photo(doc[field], wait=True)
+            except HTTPException:
+                logger.warning("Skipping %s %s: photo is not valid base64", collection_name, doc["_id"])
+                continue
+            # Response bodies change, so ETags derived from updated_at must too
+            update["updated_at"] = datetime.utcnow()
+            await db[collection_name].update_one({"_id": doc["_id"]}, {"$set": update})
+            migrated += 1
+        if migrated:
+            logger.info("Moved inline photos of %d %s to the photo store", migrated, collection_name)
+
+async def migrate_verification_documents():
+    # Inline documents, and ones stored in the public photo bucket before it was split, move to the private bucket
+    pending = db.users.find(
+        {"verification_document": {"$type": "string", "$not": {"$regex": f"^{DOCUMENT_URL_PREFIX}"}}},
+        {"id": 1, "verification_document": 1}
+    )
+    migrated = 0
+    async for user_doc in pending:
+        value = user_doc["verification_document"]
+        try:
+            if is_photo_reference(value):
+                photo_hash = value[len(PHOTO_URL_PREFIX):]
+                stream = await photo_bucket.open_download_stream_by_name(photo_hash)
+                reference = await store_photo(await stream.read(), private=True)
+                # Drop the public copy and any variants rendered from it
+                async for grid_file in photo_bucket.find({"filename": {"$regex": f"^{photo_hash}"}}):
+                    await photo_bucket.delete(grid_file._id)
+            else:
+                reference = await store_base64_photo(value, private=True)
+        except (HTTPException, NoFile):
+            logger.warning("Skipping verification document of user %s: not readable", user_doc["id"])
+            continue
+        await db.users.update_one(
+            {"_id": user_doc["_id"]}, {"$set": {"verification_document": reference, "updated_at": datetime.utcnow()}}
+        )
+        migrated += 1
+    if migrated:
+        logger.info("Moved %d verification documents to the private document store", migrated)
+
+async def backfill_reservations():
+    # Bookings made before reservations existed still hold their future dates
+    active = db.bookings.find(
+        {"end_date": {"$gte": datetime.utcnow()}, "status": {"$nin": list(RELEASED_BOOKING_STATUSES)}},
+        {"id": 1, "item_id": 1, "start_date": 1, "end_date": 1}
+    )
+    async for booking_doc in active:
+        days = reservation_days(booking_doc["start_date"], booking_doc["end_date"])
+        if not days:
+            continue
+        try:
+            await db.reservations.insert_many([
+                {
+                    "_id": reservation_key(booking_doc["item_id"], day),
+                    "item_id": booking_doc["item_id"],
+                    "day": day.isoformat(),
+                    "booking_id": booking_doc["id"],
+                    "created_at": datetime.utcnow(),
+                }
+                for day in days
+            ], ordered=False)
+        except BulkWriteError:
+            # Already backfilled, or overlapping with an older booking; first one keeps the day
+            pass
+
+async def migrate_availability_calendars():
+    # Legacy availability_calendar lists of ISO dates become bitmaps
+    legacy = db.items.find({"availability_calendar.0": {"$exists": True}}, {"availability_calendar": 1})
+    async for item_doc in legacy:
+        calendar = AvailabilityCalendar()
+        for day in item_doc["availability_calendar"]:
+            blocked_day = datetime.fromisoformat(day).date()
+            calendar.set_range(blocked_day, blocked_day + timedelta(days=1))
+        await db.items.update_one(
+            {"_id": item_doc["_id"]},
+            {"$set": {"availability": calendar.to_document()}, "$unset": {"availability_calendar": ""}}
+        )
+    await db.items.update_many(
+        {"availability_calendar": {"$exists": True}},
+        {"$unset": {"availability_calendar": ""}}
+    )
+
+@app.on_event("startup")
+async def start_image_pool():
+    global image_pool
+    image_pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    variant_renderer.start(IMAGE_WORKERS)
+
+@app.on_event("startup")
+async def start_slow_query_log():
+    # Listener callbacks run on Motor's executor threads; explains are scheduled back onto this loop
+    slow_query_log.client = client
+    slow_query_log.loop = asyncio.get_running_loop()
+
+@app.on_event("startup")
+async def bootstrap_database():
+    if REPOSITORY_BACKEND == "memory":
+        # Nothing to migrate or index; the photo store still needs MongoDB
+        app.state.popular_feed = asyncio.create_task(popular_feed_loop())
+        return
+    await migrate_item_locations()
+    await migrate_availability_calendars()
+    # Idempotent and possibly long-running on large collections, so it must not hold up startup
+    app.state.photo_migration = asyncio.create_task(migrate_inline_photos())
+    app.state.document_migration = asyncio.create_task(migrate_verification_documents())
+    app.state.reservation_backfill = asyncio.create_task(backfill_reservations())
+    app.state.popular_feed = asyncio.create_task(popular_feed_loop())
+    await ensure_indexes()
+    for collection_name, status_report in (await report_indexes()).items():
+        if status_report["missing"]:
+            logger.warning("Missing indexes on %s: %s", collection_name, ", ".join(status_report["missing"]))
+        else:
+            logger.info("Indexes on %s: %s", collection_name, ", ".join(status_report["present"]))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    if getattr(app.state, "popular_feed", None):
+        app.state.popular_feed.cancel()
+    client.close()
+
+@app.on_event("shutdown")
+async def shutdown_worker_pools():
+    variant_renderer.stop()
+    if image_pool:
+        image_pool.shutdown(cancel_futures=True)
+    password_pool.shutdown(cancel_futures=True)
\ No newline at end of file
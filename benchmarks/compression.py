@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Bytes on the wire and compression CPU per endpoint payload, for the settings CompressionMiddleware uses.
+Payloads are rendered through the same fast_json path as the API from synthetic documents;
+legacy inline-base64 item detail is included to show what uncompressed photo payloads used to cost.
+"""
+
+import argparse
+import base64
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from serialization import make_item_docs  # noqa: E402
+from response_compression import BROTLI_QUALITY, GZIP_LEVEL, brotli, compress_body  # noqa: E402
+from server import Item, ItemSearchResult, fast_json, to_search_result  # noqa: E402
+
+def payloads() -> dict:
+    items_20 = make_item_docs(20)
+    items_100 = make_item_docs(100)
+    legacy_item = dict(make_item_docs(1)[0])
+    legacy_item["photos"] = [base64.b64encode(os.urandom(150_000)).decode() for _ in range(3)]
+    return {
+        "GET /api/items?limit=20": fast_json(
+            ItemSearchResult, [to_search_result(dict(doc)) for doc in items_20], exclude={"photos"}
+        ).body,
+        "GET /api/items?limit=100": fast_json(
+            ItemSearchResult, [to_search_result(dict(doc)) for doc in items_100], exclude={"photos"}
+        ).body,
+        "GET /api/items/{id}": fast_json(Item, dict(items_20[0])).body,
+        "GET /api/items/{id} (inline base64)": fast_json(Item, legacy_item).body,
+    }
+
+def measure(body: bytes, encoding: str, iterations: int) -> tuple:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        compressed = compress_body(body, encoding)
+    return len(compressed), (time.perf_counter() - start) / iterations * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    encodings = ["gzip"] + (["br"] if brotli else [])
+    print(f"gzip level {GZIP_LEVEL}" + (f", brotli quality {BROTLI_QUALITY}" if brotli else ", brotli not installed"))
+    print(f"{'endpoint':<38} {'raw':>9} " + " ".join(f"{e + ' bytes':>11} {e + ' ms':>8}" for e in encodings))
+    for endpoint, body in payloads().items():
+        row = f"{endpoint:<38} {len(body):>9} "
+        for encoding in encodings:
+            size, cost_ms = measure(body, encoding, args.iterations)
+            row += f"{size:>11} {cost_ms:>8.3f} "
+        print(row.rstrip())
+
+if __name__ == "__main__":
+    main()
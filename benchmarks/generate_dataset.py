@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+Synthetic marketplace dataset at production scale, loaded into MONGO_URL / DB_NAME.
+Columns are generated with numpy from a single seed, documents are built batch by batch and
+written with concurrent unordered insert_many calls; indexes are built once at the end.
+Items cluster around Turkish cities, bookings follow lead-time, weekend and duration patterns
+and go to items with Zipf popularity, so review counts per item follow a power law.
+All users share one password (--password).
+"""
+
+import asyncio
+import gc
+import sys
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import typer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from server import (  # noqa: E402
+    BookingStatus, ItemCategory, RELEASED_BOOKING_STATUSES, db, ensure_indexes, password_context, reservation_key
+)
+
+# name, lat, lng, share of listings, spread (km, standard deviation)
+CITIES = [
+    ("Istanbul", 41.0082, 28.9784, 0.38, 15),
+    ("Ankara", 39.9334, 32.8597, 0.15, 10),
+    ("Izmir", 38.4237, 27.1428, 0.12, 9),
+    ("Bursa", 40.1885, 29.0610, 0.08, 7),
+    ("Antalya", 36.8969, 30.7133, 0.08, 7),
+    ("Adana", 37.0000, 35.3213, 0.06, 6),
+    ("Gaziantep", 37.0662, 37.3833, 0.07, 6),
+    ("Konya", 37.8746, 32.4932, 0.06, 6),
+]
+DISTRICTS = ["Merkez", "Cumhuriyet", "Yeni Mahalle", "Bahcelievler", "Ataturk", "Istasyon", "Carsi", "Sahil"]
+# category, share of listings, median daily price, nouns for titles
+CATEGORY_PROFILES = [
+    (ItemCategory.CAMERA, 0.10, 45.0, ["Camera", "Lens", "Tripod", "Drone", "Gimbal"]),
+    (ItemCategory.TOOLS, 0.20, 15.0, ["Drill", "Ladder", "Saw", "Pressure Washer", "Sander"]),
+    (ItemCategory.CAMPING, 0.12, 20.0, ["Tent", "Sleeping Bag", "Camp Stove", "Backpack", "Cooler"]),
+    (ItemCategory.ELECTRONICS, 0.14, 30.0, ["Projector", "Speaker", "Console", "Laptop", "Monitor"]),
+    (ItemCategory.SPORTS, 0.14, 18.0, ["Bike", "Kayak", "Surfboard", "Ski Set", "Tennis Racket"]),
+    (ItemCategory.AUTOMOTIVE, 0.06, 40.0, ["Roof Box", "Bike Rack", "Trailer", "Jump Starter", "Car Jack"]),
+    (ItemCategory.HOME, 0.16, 12.0, ["Carpet Cleaner", "Sewing Machine", "Party Tent", "Heater", "Folding Chairs"]),
+    (ItemCategory.OTHER, 0.08, 10.0, ["Costume", "Board Game", "Telescope", "Karaoke Set", "Baby Stroller"]),
+]
+ADJECTIVES = ["Professional", "Compact", "Heavy Duty", "Lightweight", "Like New", "Family Size", "Portable", "Premium"]
+FIRST_NAMES = ["Ayse", "Mehmet", "Elif", "Mustafa", "Zeynep", "Ahmet", "Fatma", "Emre", "Deniz", "Can", "Ece", "Burak"]
+LAST_NAMES = ["Yilmaz", "Kaya", "Demir", "Sahin", "Celik", "Yildiz", "Aydin", "Ozturk", "Arslan", "Dogan", "Kilic"]
+REVIEW_COMMENTS = [None, "Great, exactly as described.", "Smooth handover.", "Worked fine.", "Would rent again.",
+                   "A bit worn but did the job.", "Late pickup."]
+# P(rating = 1..5); marketplaces skew heavily positive
+RATING_WEIGHTS = [0.03, 0.04, 0.10, 0.28, 0.55]
+HISTORY_DAYS = 730
+BOOKING_HORIZON_DAYS = 60
+SECONDS_PER_DAY = 86400
+# Rounds in which a request for already taken dates picks another item before it is rejected
+OVERLAP_RETRIES = 3
+
+def make_ids(rng: np.random.Generator, count: int) -> np.ndarray:
+    # Seeded UUID4 strings; uuid.uuid4() would make every run different
+    raw = rng.integers(0, 256, size=(count, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    hex_digits = raw.tobytes().hex()
+    return np.array([
+        f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:32]}"
+        for h in (hex_digits[offset:offset + 32] for offset in range(0, count * 32, 32))
+    ], dtype=object)
+
+def to_datetimes(seconds: np.ndarray) -> list:
+    return seconds.astype("datetime64[s]").astype("datetime64[ms]").tolist()
+
+def power_law_sampler(rng: np.random.Generator, exponent: float, population: int, offset: float = 10):
+    """Draws indices with P(rank k) ~ (k + offset)^-exponent over a random order of the population.
+    numpy's unbounded zipf would hand a quarter of all draws to rank 1."""
+    weights = (np.arange(population) + offset) ** -exponent
+    probabilities = weights / weights.sum()
+    order = rng.permutation(population)
+    return lambda size: order[rng.choice(population, size=size, p=probabilities)]
+
+def generate_users(rng: np.random.Generator, count: int, anchor: int, seed: int) -> dict:
+    return {
+        "id": make_ids(rng, count),
+        "first_name": rng.integers(0, len(FIRST_NAMES), count),
+        "last_name": rng.integers(0, len(LAST_NAMES), count),
+        "created_at": anchor - rng.integers(0, HISTORY_DAYS * SECONDS_PER_DAY, count),
+        "is_verified": rng.random(count) < 0.3,
+        "seed": seed,
+    }
+
+def generate_items(rng: np.random.Generator, count: int, users: dict, anchor: int) -> dict:
+    user_count = len(users["id"])
+    # A minority of users lists almost everything, a few of them power lenders
+    lenders = rng.permutation(user_count)[:max(1, user_count * 3 // 10)]
+    owner = lenders[power_law_sampler(rng, 1.2, len(lenders), offset=5)(count)]
+
+    shares = np.array([city[3] for city in CITIES])
+    city = rng.choice(len(CITIES), size=count, p=shares / shares.sum())
+    city_lat = np.array([c[1] for c in CITIES])[city]
+    city_lng = np.array([c[2] for c in CITIES])[city]
+    spread_km = np.array([c[4] for c in CITIES])[city]
+    lat = city_lat + rng.normal(0, 1, count) * spread_km / 111.0
+    lng = city_lng + rng.normal(0, 1, count) * spread_km / (111.0 * np.cos(np.radians(city_lat)))
+
+    category_shares = np.array([profile[1] for profile in CATEGORY_PROFILES])
+    category = rng.choice(len(CATEGORY_PROFILES), size=count, p=category_shares / category_shares.sum())
+    median_price = np.array([profile[2] for profile in CATEGORY_PROFILES])[category]
+    price = np.round(median_price * rng.lognormal(0, 0.6, count), 2).clip(1)
+    hourly = rng.random(count) < 0.3
+
+    owner_since = users["created_at"][owner]
+    created_at = owner_since + (rng.random(count) * (anchor - owner_since)).astype(np.int64)
+    return {
+        "id": make_ids(rng, count),
+        "owner": owner,
+        "city": city,
+        "district": rng.integers(0, len(DISTRICTS), count),
+        "lat": lat,
+        "lng": lng,
+        "category": category,
+        "noun": rng.integers(0, 5, count),
+        "adjective": rng.integers(0, len(ADJECTIVES), count),
+        "price": price,
+        "hourly": hourly,
+        "is_available": rng.random(count) < 0.95,
+        "created_at": created_at,
+    }
+
+def generate_bookings(rng: np.random.Generator, count: int, users: dict, items: dict, anchor: int) -> dict:
+    user_count = len(users["id"])
+    sample_items = power_law_sampler(rng, 1.0, len(items["id"]))
+    item = sample_items(count)
+
+    anchor_day = anchor // SECONDS_PER_DAY
+    start_day = anchor_day + rng.integers(-HISTORY_DAYS // 2, BOOKING_HORIZON_DAYS, count)
+    # Weekend trips: a fifth of rentals move their start to the Friday of that week (1970-01-01 was a Thursday)
+    weekday = (start_day + 3) % 7
+    friday = rng.random(count) < 0.2
+    start_day = np.where(friday, start_day + (4 - weekday) % 7, start_day)
+    nights = np.minimum(1 + rng.geometric(0.35, count), 21)
+    end_day = start_day + nights
+
+    start = start_day * SECONDS_PER_DAY + 10 * 3600
+    lead_seconds = (rng.exponential(9, count) * SECONDS_PER_DAY).astype(np.int64)
+    created_at = np.minimum(start - lead_seconds, anchor)
+
+    status = np.empty(count, dtype=object)
+    past = end_day <= anchor_day
+    ongoing = (start_day <= anchor_day) & ~past
+    roll = rng.random(count)
+    status[past] = np.where(roll[past] < 0.86, BookingStatus.COMPLETED.value,
+                            np.where(roll[past] < 0.98, BookingStatus.REJECTED.value, BookingStatus.DISPUTED.value))
+    status[ongoing] = BookingStatus.ACTIVE.value
+    upcoming = ~past & ~ongoing
+    status[upcoming] = np.where(roll[upcoming] < 0.45, BookingStatus.PENDING.value,
+                                np.where(roll[upcoming] < 0.95, BookingStatus.APPROVED.value, BookingStatus.REJECTED.value))
+
+    # Popular items fill up: a request for taken dates usually goes to another listing, else it is rejected
+    for attempt in range(OVERLAP_RETRIES + 1):
+        clashes = overlapping_bookings(item, start_day, end_day, created_at, status)
+        if attempt == OVERLAP_RETRIES or not len(clashes):
+            break
+        item[clashes] = sample_items(len(clashes))
+    status[clashes] = BookingStatus.REJECTED.value
+
+    owner = items["owner"][item]
+    renter = rng.integers(0, user_count, count)
+    renter = np.where(renter == owner, (renter + 1) % user_count, renter)
+    total = items["price"][item] * nights
+    return {
+        "id": make_ids(rng, count),
+        "item": item,
+        "owner": owner,
+        "renter": renter,
+        "start_day": start_day,
+        "end_day": end_day,
+        "start": start,
+        "end": end_day * SECONDS_PER_DAY + 10 * 3600,
+        "created_at": created_at,
+        "status": status,
+        "total": np.round(total, 2),
+        "deposit": np.round(total * 0.2, 2),
+    }
+
+def overlapping_bookings(item, start_day, end_day, created_at, status) -> np.ndarray:
+    # An item is never double-booked: of overlapping bookings the earliest request keeps the dates
+    released = np.isin(status, [released_status.value for released_status in RELEASED_BOOKING_STATUSES])
+    holding = np.flatnonzero(~released)
+    order = holding[np.lexsort((created_at[holding], start_day[holding], item[holding]))]
+    clashes = []
+    last_item, last_end = -1, 0
+    for index, item_index, start, end in zip(
+        order.tolist(), item[order].tolist(), start_day[order].tolist(), end_day[order].tolist()
+    ):
+        if item_index == last_item and start < last_end:
+            clashes.append(index)
+        else:
+            last_item, last_end = item_index, end
+    return np.array(clashes, dtype=np.int64)
+
+def generate_reviews(rng: np.random.Generator, bookings: dict) -> dict:
+    completed = np.flatnonzero(bookings["status"] == BookingStatus.COMPLETED.value)
+    # Per completed booking: renter -> item, renter -> owner, owner -> renter
+    kinds = []
+    for kind, probability in (("item", 0.7), ("owner", 0.45), ("renter", 0.35)):
+        chosen = completed[rng.random(len(completed)) < probability]
+        kinds.append((kind, chosen))
+    booking = np.concatenate([chosen for _, chosen in kinds])
+    kind = np.concatenate([np.full(len(chosen), index) for index, (_, chosen) in enumerate(kinds)])
+    count = len(booking)
+    created_at = bookings["end"][booking] + (rng.exponential(2, count) * SECONDS_PER_DAY).astype(np.int64)
+    return {
+        "id": make_ids(rng, count),
+        "booking": booking,
+        "kind": kind,  # 0 item, 1 owner, 2 renter
+        "rating": rng.choice(5, size=count, p=RATING_WEIGHTS) + 1,
+        "comment": rng.integers(0, len(REVIEW_COMMENTS), count),
+        "created_at": created_at,
+    }
+
+def rating_totals(reviews: dict, bookings: dict, user_count: int, item_count: int) -> tuple:
+    booking = reviews["booking"]
+    is_item = reviews["kind"] == 0
+    item_target = bookings["item"][booking[is_item]]
+    user_target = np.where(reviews["kind"] == 1, bookings["owner"][booking], bookings["renter"][booking])[~is_item]
+    item_sum = np.bincount(item_target, weights=reviews["rating"][is_item], minlength=item_count)
+    item_reviews = np.bincount(item_target, minlength=item_count)
+    user_sum = np.bincount(user_target, weights=reviews["rating"][~is_item], minlength=user_count)
+    user_reviews = np.bincount(user_target, minlength=user_count)
+    return (user_sum.astype(np.int64), user_reviews), (item_sum.astype(np.int64), item_reviews)
+
+def ratings(totals: tuple, lo: int, hi: int):
+    rating_sum, rating_count = totals[0][lo:hi].tolist(), totals[1][lo:hi].tolist()
+    return zip(rating_sum, rating_count, (total / count if count else 0.0 for total, count in zip(rating_sum, rating_count)))
+
+# Document builders work on .tolist() slices of a batch; indexing numpy scalars one by one is several times slower
+def user_documents(users: dict, totals: tuple, password_hash: str, lo: int, hi: int) -> list:
+    seed = users["seed"]
+    return [
+        {
+            "id": user_id,
+            "email": f"user{index}@seed{seed}.example.com",
+            "phone": None,
+            "password_hash": password_hash,
+            "first_name": FIRST_NAMES[first_name],
+            "last_name": LAST_NAMES[last_name],
+            "profile_photo": None,
+            "bio": None,
+            "is_verified": is_verified,
+            "verification_document": None,
+            "rating": rating,
+            "total_reviews": rating_count,
+            "rating_sum": rating_sum,
+            "rating_count": rating_count,
+            "role": "user",
+            "location": None,
+            "created_at": created_at,
+            "updated_at": created_at,
+            "is_active": True,
+        }
+        for index, user_id, first_name, last_name, is_verified, created_at, (rating_sum, rating_count, rating) in zip(
+            range(lo, hi),
+            users["id"][lo:hi].tolist(),
+            users["first_name"][lo:hi].tolist(),
+            users["last_name"][lo:hi].tolist(),
+            users["is_verified"][lo:hi].tolist(),
+            to_datetimes(users["created_at"][lo:hi]),
+            ratings(totals, lo, hi),
+        )
+    ]
+
+def item_documents(items: dict, users: dict, totals: tuple, lo: int, hi: int) -> list:
+    documents = []
+    columns = zip(
+        items["id"][lo:hi].tolist(),
+        users["id"][items["owner"][lo:hi]].tolist(),
+        items["category"][lo:hi].tolist(),
+        items["noun"][lo:hi].tolist(),
+        items["adjective"][lo:hi].tolist(),
+        items["city"][lo:hi].tolist(),
+        items["district"][lo:hi].tolist(),
+        items["price"][lo:hi].tolist(),
+        items["hourly"][lo:hi].tolist(),
+        items["lng"][lo:hi].tolist(),
+        items["lat"][lo:hi].tolist(),
+        items["is_available"][lo:hi].tolist(),
+        to_datetimes(items["created_at"][lo:hi]),
+        ratings(totals, lo, hi),
+    )
+    for (item_id, owner_id, category_index, noun, adjective, city_index, district, price, hourly, lng, lat,
+         is_available, created_at, (rating_sum, rating_count, rating)) in columns:
+        category, _, _, nouns = CATEGORY_PROFILES[category_index]
+        city, district = CITIES[city_index][0], DISTRICTS[district]
+        documents.append({
+            "id": item_id,
+            "owner_id": owner_id,
+            "title": f"{ADJECTIVES[adjective]} {nouns[noun]}",
+            "description": f"{nouns[noun]} for rent in {city}, pickup in {district}.",
+            "category": category.value,
+            "photos": [],
+            "price_per_day": price,
+            "price_per_hour": round(price / 6, 2) if hourly else None,
+            "location": {"type": "Point", "coordinates": [lng, lat]},
+            "address": f"{district}, {city}",
+            "is_available": is_available,
+            "rating": rating,
+            "total_reviews": rating_count,
+            "rating_sum": rating_sum,
+            "rating_count": rating_count,
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    return documents
+
+def booking_documents(bookings: dict, items: dict, users: dict, lo: int, hi: int) -> list:
+    return [
+        {
+            "id": booking_id,
+            "item_id": item_id,
+            "renter_id": renter_id,
+            "owner_id": owner_id,
+            "start_date": start,
+            "end_date": end,
+            "total_amount": total,
+            "deposit_amount": deposit,
+            "status": status,
+            "payment_id": f"mock_payment_{booking_id}",
+            "damage_photos_before": [],
+            "damage_photos_after": [],
+            "notes": None,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+        for booking_id, item_id, renter_id, owner_id, start, end, total, deposit, status, created_at in zip(
+            bookings["id"][lo:hi].tolist(),
+            items["id"][bookings["item"][lo:hi]].tolist(),
+            users["id"][bookings["renter"][lo:hi]].tolist(),
+            users["id"][bookings["owner"][lo:hi]].tolist(),
+            to_datetimes(bookings["start"][lo:hi]),
+            to_datetimes(bookings["end"][lo:hi]),
+            bookings["total"][lo:hi].tolist(),
+            bookings["deposit"][lo:hi].tolist(),
+            bookings["status"][lo:hi].tolist(),
+            to_datetimes(bookings["created_at"][lo:hi]),
+        )
+    ]
+
+def review_documents(reviews: dict, bookings: dict, items: dict, users: dict, lo: int, hi: int) -> list:
+    booking = reviews["booking"][lo:hi]
+    kind = reviews["kind"][lo:hi]
+    renter_id = users["id"][bookings["renter"][booking]]
+    owner_id = users["id"][bookings["owner"][booking]]
+    item_id = items["id"][bookings["item"][booking]]
+    # kind 0: renter reviews the item, 1: renter reviews the owner, 2: owner reviews the renter
+    reviewer_id = np.where(kind == 2, owner_id, renter_id)
+    reviewed_id = np.select([kind == 0, kind == 1], [item_id, owner_id], renter_id)
+    return [
+        {
+            "id": review_id,
+            "booking_id": booking_id,
+            "reviewer_id": reviewer,
+            "reviewed_id": reviewed,
+            "reviewed_type": "item" if review_kind == 0 else "user",
+            "rating": rating,
+            "comment": REVIEW_COMMENTS[comment],
+            "photos": [],
+            "created_at": created_at,
+        }
+        for review_id, booking_id, reviewer, reviewed, review_kind, rating, comment, created_at in zip(
+            reviews["id"][lo:hi].tolist(),
+            bookings["id"][booking].tolist(),
+            reviewer_id.tolist(),
+            reviewed_id.tolist(),
+            kind.tolist(),
+            reviews["rating"][lo:hi].tolist(),
+            reviews["comment"][lo:hi].tolist(),
+            to_datetimes(reviews["created_at"][lo:hi]),
+        )
+    ]
+
+def reservation_rows(bookings: dict, anchor: int) -> tuple:
+    # Same rule as backfill_reservations: bookings still holding their dates reserve every night
+    released = [released_status.value for released_status in RELEASED_BOOKING_STATUSES]
+    holding = np.flatnonzero((bookings["end"] >= anchor) & ~np.isin(bookings["status"], released))
+    nights = (bookings["end_day"] - bookings["start_day"])[holding]
+    booking = np.repeat(holding, nights)
+    first_night = np.repeat(np.cumsum(nights) - nights, nights)
+    day = bookings["start_day"][booking] + (np.arange(len(booking)) - first_night)
+    return booking, day
+
+def reservation_documents(rows: tuple, bookings: dict, items: dict, lo: int, hi: int, now: datetime) -> list:
+    booking, day = rows[0][lo:hi], rows[1][lo:hi]
+    return [
+        {
+            "_id": reservation_key(item_id, reserved_day),
+            "item_id": item_id,
+            "day": reserved_day.isoformat(),
+            "booking_id": booking_id,
+            "created_at": now,
+        }
+        for item_id, booking_id, reserved_day in zip(
+            items["id"][bookings["item"][booking]].tolist(),
+            bookings["id"][booking].tolist(),
+            day.astype("datetime64[D]").tolist(),
+        )
+    ]
+
+async def load(collection_name: str, count: int, build, batch_size: int, writers: int, dry_run: bool):
+    started = time.perf_counter()
+    slots = asyncio.Semaphore(writers)
+
+    async def write(lo: int):
+        async with slots:
+            documents = build(lo, min(lo + batch_size, count))
+            if not dry_run:
+                await db[collection_name].insert_many(documents, ordered=False)
+
+    await asyncio.gather(*(write(lo) for lo in range(0, count, batch_size)))
+    elapsed = time.perf_counter() - started
+    typer.echo(f"{collection_name:<13} {count:>10} docs in {elapsed:6.1f}s ({count / max(elapsed, 1e-9):,.0f}/s)")
+
+async def generate(
+    user_count: int, item_count: int, booking_count: int, seed: int, anchor_date: date, password: str,
+    batch_size: int, writers: int, drop: bool, build_indexes: bool, dry_run: bool
+):
+    started = time.perf_counter()
+    # Millions of short-lived acyclic dicts would otherwise trigger a collection every few hundred documents
+    gc.disable()
+    rng = np.random.default_rng(seed)
+    # Midnight UTC of the anchor day, in epoch seconds like every other timestamp column
+    anchor = (anchor_date - date(1970, 1, 1)).days * SECONDS_PER_DAY
+
+    users = generate_users(rng, user_count, anchor, seed)
+    items = generate_items(rng, item_count, users, anchor)
+    bookings = generate_bookings(rng, booking_count, users, items, anchor)
+    reviews = generate_reviews(rng, bookings)
+    user_totals, item_totals = rating_totals(reviews, bookings, user_count, item_count)
+    reservations = reservation_rows(bookings, anchor)
+    typer.echo(f"columns generated in {time.perf_counter() - started:.1f}s")
+
+    if drop and not dry_run:
+        for collection_name in ("users", "items", "bookings", "reviews", "reservations", "popular_items"):
+            await db[collection_name].drop()
+
+    password_hash = password_context.hash(password)
+    now = datetime.utcnow()
+    await load("users", user_count, lambda lo, hi: user_documents(users, user_totals, password_hash, lo, hi),
+               batch_size, writers, dry_run)
+    await load("items", item_count, lambda lo, hi: item_documents(items, users, item_totals, lo, hi),
+               batch_size, writers, dry_run)
+    await load("bookings", booking_count, lambda lo, hi: booking_documents(bookings, items, users, lo, hi),
+               batch_size, writers, dry_run)
+    await load("reviews", len(reviews["id"]), lambda lo, hi: review_documents(reviews, bookings, items, users, lo, hi),
+               batch_size, writers, dry_run)
+    await load("reservations", len(reservations[0]),
+               lambda lo, hi: reservation_documents(reservations, bookings, items, lo, hi, now),
+               batch_size, writers, dry_run)
+
+    if build_indexes and not dry_run:
+        index_started = time.perf_counter()
+        await ensure_indexes()
+        typer.echo(f"indexes built in {time.perf_counter() - index_started:.1f}s")
+    review_counts = item_totals[1]
+    typer.echo(
+        f"done in {time.perf_counter() - started:.1f}s; reviews per item: max {review_counts.max()}, "
+        f"p99 {np.percentile(review_counts, 99):.0f}, median {np.median(review_counts):.0f}"
+    )
+
+def main(
+    users: int = typer.Option(10_000, help="Number of users."),
+    items: int = typer.Option(100_000, help="Number of items."),
+    bookings: int = typer.Option(200_000, help="Number of bookings; reviews follow from completed ones."),
+    seed: int = typer.Option(42, help="Same seed and anchor give the same dataset."),
+    anchor: Optional[str] = typer.Option(None, help="'Today' for the generated history, YYYY-MM-DD; defaults to today."),
+    password: str = typer.Option("password123", help="Password of every generated user."),
+    batch_size: int = typer.Option(10_000, help="Documents per insert_many."),
+    writers: int = typer.Option(4, help="Concurrent insert_many calls."),
+    drop: bool = typer.Option(False, help="Drop the marketplace collections first."),
+    indexes: bool = typer.Option(True, help="Build the server's indexes after loading."),
+    dry_run: bool = typer.Option(False, help="Build every document but write nothing, to time generation alone."),
+):
+    anchor_date = date.fromisoformat(anchor) if anchor else date.today()
+    asyncio.run(generate(
+        users, items, bookings, seed, anchor_date, password, batch_size, writers, drop, indexes, dry_run
+    ))
+
+if __name__ == "__main__":
+    typer.run(main)
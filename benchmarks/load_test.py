@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Concurrent load generator for a locally running API (uvicorn server:app --port 8001).
+Scenarios: browse (read-heavy mix), booking-rush (many renters racing for a few items)
+and review-burst (book then review in quick succession). Requests arrive either as a
+Poisson process at --rate per second, or from --concurrency closed-loop workers when
+--rate is 0. Reports p50/p95/p99 latency per endpoint template.
+"""
+
+import argparse
+import asyncio
+import contextvars
+import random
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+
+CATEGORIES = ["camera", "tools", "camping", "electronics", "sports", "automotive", "home", "other"]
+SEARCH_TERMS = ["drill", "tent", "camera", "bike", "ladder", "speaker"]
+CITY_CENTRES = [(41.0082, 28.9784), (39.9334, 32.8597), (38.4237, 27.1428)]
+# Statuses a scenario provokes on purpose, e.g. 409 for a date clash during a booking rush
+EXPECTED_STATUSES = {"POST /api/bookings": {409}}
+# In open-loop mode, when the current iteration was due. Its first request is timed from then,
+# so time spent waiting behind earlier iterations counts as latency instead of vanishing
+scheduled_arrival = contextvars.ContextVar("scheduled_arrival", default=None)
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, status_code: int, elapsed: float):
+        self.latencies[endpoint].append(elapsed)
+        self.statuses[endpoint][status_code] += 1
+
+    def errors(self, endpoint: str) -> int:
+        expected = EXPECTED_STATUSES.get(endpoint, set())
+        return sum(
+            count for code, count in self.statuses[endpoint].items()
+            if (code >= 400 or code == 0) and code not in expected
+        )
+
+    def report(self, wall_time: float):
+        total = sum(len(samples) for samples in self.latencies.values())
+        print(f"{total} requests in {wall_time:.1f}s ({total / wall_time:.1f} req/s)")
+        print(f"{'endpoint':<40} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  statuses")
+        for endpoint in sorted(self.latencies):
+            samples = sorted(self.latencies[endpoint])
+            statuses = ",".join(f"{code}:{count}" for code, count in sorted(self.statuses[endpoint].items()))
+            print(
+                f"{endpoint:<40} {len(samples):>7} {self.errors(endpoint):>7} "
+                f"{percentile(samples, 50):>9.1f} {percentile(samples, 95):>9.1f} "
+                f"{percentile(samples, 99):>9.1f} {samples[-1] * 1000:>9.1f}  {statuses}"
+            )
+
+def percentile(sorted_samples: list, pct: float) -> float:
+    # Nearest-rank, in milliseconds
+    index = max(0, min(len(sorted_samples) - 1, int(round(pct / 100 * len(sorted_samples))) - 1))
+    return sorted_samples[index] * 1000
+
+class LoadClient:
+    def __init__(self, http: httpx.AsyncClient, recorder: Recorder):
+        self.http = http
+        self.recorder = recorder
+
+    async def call(self, method: str, endpoint: str, path: str, token: str = None, **kwargs):
+        """endpoint is the template reported on, path the concrete URL requested."""
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        start = scheduled_arrival.get() or time.perf_counter()
+        scheduled_arrival.set(None)
+        try:
+            response = await self.http.request(method, path, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(endpoint, 0, time.perf_counter() - start)
+            return None
+        self.recorder.record(endpoint, response.status_code, time.perf_counter() - start)
+        return response
+
+class Fixture:
+    """Users and items created up front so scenarios only exercise the steady-state endpoints."""
+
+    def __init__(self):
+        self.users = []  # (user_id, token)
+        self.items = []  # (item_id, owner_id)
+        self.owner_tokens = {}
+
+    async def populate(self, client: LoadClient, users: int, items_per_user: int, rng: random.Random):
+        run_id = uuid.uuid4().hex[:8]
+
+        async def setup_user(index: int):
+            response = await client.call("POST", "POST /api/auth/register", "/api/auth/register", json={
+                "email": f"load-{run_id}-{index}@example.com",
+                "password": "load-test-password",
+                "first_name": "Load",
+                "last_name": f"User {index}",
+            })
+            if response is None or response.status_code != 200:
+                raise SystemExit(f"Could not register load-test user: {response.text if response else 'no response'}")
+            body = response.json()
+            user_id, token = body["user"]["id"], body["token"]
+            self.users.append((user_id, token))
+            self.owner_tokens[user_id] = token
+            for _ in range(items_per_user):
+                lat, lng = rng.choice(CITY_CENTRES)
+                response = await client.call("POST", "POST /api/items", "/api/items", token=token, json={
+                    "title": f"{rng.choice(SEARCH_TERMS).title()} for rent",
+                    "description": "Created by the load-test fixture",
+                    "category": rng.choice(CATEGORIES),
+                    "price_per_day": round(rng.uniform(5, 150), 2),
+                    "location": {"lat": lat + rng.gauss(0, 0.05), "lng": lng + rng.gauss(0, 0.05)},
+                    "address": "Load test street",
+                })
+                if response is not None and response.status_code == 200:
+                    self.items.append((response.json()["id"], user_id))
+
+        await asyncio.gather(*(setup_user(index) for index in range(users)))
+        if not self.items:
+            raise SystemExit("Fixture created no items; is the server running with a writable database?")
+
+def booking_window(rng: random.Random, horizon_days: int) -> dict:
+    start = datetime.utcnow().replace(hour=10, minute=0, second=0, microsecond=0)
+    start += timedelta(days=rng.randint(1, horizon_days))
+    end = start + timedelta(days=rng.randint(1, 4))
+    return {"start_date": start.isoformat(), "end_date": end.isoformat()}
+
+async def browse(client: LoadClient, fixture: Fixture, rng: random.Random):
+    item_id, owner_id = rng.choice(fixture.items)
+    action = rng.choices(
+        ["list", "search", "nearby", "detail", "availability", "reviews", "popular", "facets"],
+        weights=[25, 15, 10, 20, 10, 10, 5, 5],
+    )[0]
+    if action == "list":
+        await client.call("GET", "GET /api/items", "/api/items", params={"category": rng.choice(CATEGORIES)})
+    elif action == "search":
+        await client.call("GET", "GET /api/items?search", "/api/items", params={"search": rng.choice(SEARCH_TERMS)})
+    elif action == "nearby":
+        lat, lng = rng.choice(CITY_CENTRES)
+        # Geo queries are always nearest first
+        await client.call("GET", "GET /api/items?lat&lng", "/api/items", params={"lat": lat, "lng": lng})
+    elif action == "detail":
+        await client.call("GET", "GET /api/items/{id}", f"/api/items/{item_id}")
+    elif action == "availability":
+        await client.call("GET", "GET /api/items/{id}/availability", f"/api/items/{item_id}/availability")
+    elif action == "reviews":
+        reviewed_id, reviewed_type = rng.choice([(item_id, "item"), (owner_id, "user")])
+        await client.call(
+            "GET", "GET /api/reviews/{id}", f"/api/reviews/{reviewed_id}", params={"reviewed_type": reviewed_type}
+        )
+    elif action == "popular":
+        await client.call("GET", "GET /api/search/popular", "/api/search/popular")
+    else:
+        await client.call("GET", "GET /api/search/facets", "/api/search/facets")
+
+async def booking_rush(client: LoadClient, fixture: Fixture, rng: random.Random):
+    # A handful of hot items and a short horizon make date clashes (409) the norm
+    hot_items = fixture.items[:max(1, len(fixture.items) // 20)]
+    item_id, owner_id = rng.choice(hot_items)
+    renter_id, token = rng.choice([user for user in fixture.users if user[0] != owner_id] or fixture.users)
+    response = await client.call(
+        "POST", "POST /api/bookings", "/api/bookings", token=token,
+        json={"item_id": item_id, **booking_window(rng, horizon_days=14)},
+    )
+    if response is not None and response.status_code == 200 and rng.random() < 0.5:
+        booking_id = response.json()["id"]
+        status = rng.choice(["approved", "rejected"])
+        await client.call(
+            "PUT", "PUT /api/bookings/{id}/status", f"/api/bookings/{booking_id}/status",
+            token=fixture.owner_tokens[owner_id], json={"status": status},
+        )
+    await client.call("GET", "GET /api/bookings/my-bookings", "/api/bookings/my-bookings", token=token,
+                      params={"expand": "item,counterparty"})
+
+async def review_burst(client: LoadClient, fixture: Fixture, rng: random.Random):
+    item_id, owner_id = rng.choice(fixture.items)
+    renter_id, token = rng.choice([user for user in fixture.users if user[0] != owner_id] or fixture.users)
+    response = await client.call(
+        "POST", "POST /api/bookings", "/api/bookings", token=token,
+        json={"item_id": item_id, **booking_window(rng, horizon_days=365)},
+    )
+    if response is None or response.status_code != 200:
+        return
+    booking_id = response.json()["id"]
+    # Renter reviews item and owner back to back, the owner answers: three rating updates per booking
+    reviews = [(token, item_id, "item"), (token, owner_id, "user"), (fixture.owner_tokens[owner_id], renter_id, "user")]
+    await asyncio.gather(*(
+        client.call("POST", "POST /api/reviews", "/api/reviews", token=reviewer_token, json={
+            "booking_id": booking_id,
+            "reviewed_id": reviewed_id,
+            "reviewed_type": reviewed_type,
+            "rating": rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 3, 8, 12])[0],
+            "comment": "Load test review",
+        })
+        for reviewer_token, reviewed_id, reviewed_type in reviews
+    ))
+    await client.call("GET", "GET /api/reviews/{id}", f"/api/reviews/{item_id}", params={"reviewed_type": "item"})
+
+SCENARIOS = {"browse": browse, "booking-rush": booking_rush, "review-burst": review_burst}
+
+async def run(args):
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as http:
+        client = LoadClient(http, recorder)
+        fixture = Fixture()
+        await fixture.populate(client, args.users, args.items_per_user, rng)
+        # Setup traffic is not part of the measurement
+        recorder = client.recorder = Recorder()
+
+        scenarios = [SCENARIOS[name] for name in args.scenario]
+        deadline = time.perf_counter() + args.duration
+        start = time.perf_counter()
+        peak_in_flight = 0
+        if args.rate > 0:
+            # Open loop: arrivals keep to their own schedule and never wait for earlier iterations.
+            # Requests queue for one of the --concurrency connections inside the timed call, and the
+            # first request of an iteration is timed from its scheduled arrival, so queueing shows up in the tail
+            in_flight = set()
+
+            async def iteration(arrival: float):
+                scheduled_arrival.set(arrival)
+                await rng.choice(scenarios)(client, fixture, rng)
+
+            arrival = time.perf_counter()
+            while arrival < deadline:
+                task = asyncio.create_task(iteration(arrival))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+                peak_in_flight = max(peak_in_flight, len(in_flight))
+                arrival += rng.expovariate(args.rate)
+                await asyncio.sleep(max(0, arrival - time.perf_counter()))
+            await asyncio.gather(*in_flight)
+        else:
+            async def worker():
+                while time.perf_counter() < deadline:
+                    await rng.choice(scenarios)(client, fixture, rng)
+
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall_time = time.perf_counter() - start
+
+    mode = f"arrival rate {args.rate}/s, peak {peak_in_flight} iterations in flight" if args.rate > 0 else "closed loop"
+    print(f"scenarios {', '.join(args.scenario)}; concurrency {args.concurrency}; {mode}")
+    recorder.report(wall_time)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8001")
+    parser.add_argument("--scenario", nargs="+", choices=sorted(SCENARIOS), default=["browse"])
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=0, help="scenario iterations per second; 0 for closed loop")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--items-per-user", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Login throughput per worker process at different scrypt cost settings.
+Runs the same verify path as POST /api/auth/login (password pool + CryptContext), no server or MongoDB needed.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from server import build_password_context, PASSWORD_HASH_WORKERS  # noqa: E402
+
+async def measure(scrypt_rounds: int, workers: int, duration: float) -> dict:
+    context = build_password_context(scrypt_rounds)
+    stored_hash = context.hash("correct horse battery staple")
+    pool = ThreadPoolExecutor(max_workers=workers)
+    loop = asyncio.get_running_loop()
+
+    start = time.perf_counter()
+    context.verify("correct horse battery staple", stored_hash)
+    single_latency = time.perf_counter() - start
+
+    completed = 0
+    deadline = time.perf_counter() + duration
+
+    async def login_loop():
+        nonlocal completed
+        while time.perf_counter() < deadline:
+            await loop.run_in_executor(pool, context.verify, "correct horse battery staple", stored_hash)
+            completed += 1
+
+    # Twice as many concurrent logins as threads keeps the pool saturated
+    start = time.perf_counter()
+    await asyncio.gather(*(login_loop() for _ in range(workers * 2)))
+    elapsed = time.perf_counter() - start
+    pool.shutdown()
+
+    return {
+        "rounds": scrypt_rounds,
+        "latency_ms": single_latency * 1000,
+        "logins_per_sec": completed / elapsed,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[12, 13, 14, 15, 16],
+                        help="scrypt log2(N) values to compare")
+    parser.add_argument("--workers", type=int, default=PASSWORD_HASH_WORKERS, help="password pool size")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per setting")
+    args = parser.parse_args()
+
+    print(f"Password pool: {args.workers} threads, {args.duration:.0f}s per setting")
+    print(f"{'ln(N)':>6} {'single verify (ms)':>20} {'logins/sec/worker':>18}")
+    for scrypt_rounds in args.rounds:
+        result = await measure(scrypt_rounds, args.workers, args.duration)
+        print(f"{result['rounds']:>6} {result['latency_ms']:>20.1f} {result['logins_per_sec']:>18.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+List-endpoint serialization cost before and after the fast read path.
+"Before" replays what FastAPI did for GET /api/items: Model(**doc) in the handler, response_model
+validation + jsonable serialization, then json.dumps. "After" is fast_json: one cached TypeAdapter
+validation and a direct dump to JSON bytes.
+No server or MongoDB needed; documents are synthetic but shaped like stored items.
+"""
+
+import argparse
+import asyncio
+import copy
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from server import ItemSearchResult, fast_json, to_search_result  # noqa: E402
+
+def make_item_docs(count: int) -> List[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "owner_id": str(uuid.uuid4()),
+            "title": f"Item {index}",
+            "description": "Mirrorless camera with two lenses, charger and a spare battery. " * 3,
+            "category": "camera",
+            "photos": [f"/api/photos/{uuid.uuid4().hex * 2}" for _ in range(4)],
+            "price_per_day": 25.0 + index,
+            "price_per_hour": None,
+            "location": {"type": "Point", "coordinates": [28.97 + index * 1e-4, 41.01]},
+            "address": "Istanbul",
+            "is_available": True,
+            "rating": 4.5,
+            "total_reviews": 12,
+            "rating_sum": 54,
+            "rating_count": 12,
+            "created_at": now - timedelta(minutes=index),
+            "updated_at": now,
+        }
+        for index in range(count)
+    ]
+
+async def before(docs: List[dict], field) -> bytes:
+    items = [ItemSearchResult(**copy.copy(doc)) for doc in docs]
+    content = await serialize_response(field=field, response_content=items, exclude={"photos"}, is_coroutine=True)
+    return JSONResponse(content).body
+
+async def after(docs: List[dict], field) -> bytes:
+    return fast_json(ItemSearchResult, [to_search_result(copy.copy(doc)) for doc in docs], exclude={"photos"}).body
+
+async def timed(function, docs, field, iterations: int) -> float:
+    await function(docs, field)  # warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await function(docs, field)
+    return (time.perf_counter() - start) / iterations * 1000
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 500])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    field = create_response_field(name="Response_get_items", type_=List[ItemSearchResult])
+    print(f"{'items':>6} {'before (ms)':>12} {'after (ms)':>11} {'speedup':>8}")
+    for size in args.sizes:
+        docs = make_item_docs(size)
+        before_ms = await timed(before, docs, field, args.iterations)
+        after_ms = await timed(after, docs, field, args.iterations)
+        print(f"{size:>6} {before_ms:>12.3f} {after_ms:>11.3f} {before_ms / after_ms:>7.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
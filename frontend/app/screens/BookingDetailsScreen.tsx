@@ -14,6 +14,7 @@ import { useNavigation, useRoute } from '@react-navigation/native';
 import { useAuth } from '../context/AuthContext';
 import * as ImagePicker from 'expo-image-picker';
 import axios from 'axios';
+import { photoUri } from '../utils/photos';
 
 interface Booking {
   id: string;
@@ -33,7 +34,7 @@ interface Booking {
   item?: {
     id: string;
     title: string;
-    photos: string[];
+    cover_photo?: string;
     category: string;
     address: string;
   };
@@ -171,7 +172,7 @@ export default function BookingDetailsScreen() {
         {photos.map((photo, index) => (
           <Image
             key={index}
-            source={{ uri: `data:image/jpeg;base64,${photo}` }}
+            source={{ uri: photoUri(photo) }}
             style={styles.damagePhoto}
           />
         ))}
@@ -214,9 +215,9 @@ export default function BookingDetailsScreen() {
         <View style={styles.section}>
           <Text style={styles.sectionTitle}>Item Details</Text>
           <View style={styles.itemContainer}>
-            {booking.item?.photos && booking.item.photos.length > 0 ? (
+            {booking.item?.cover_photo ? (
               <Image
-                source={{ uri: `data:image/jpeg;base64,${booking.item.photos[0]}` }}
+                source={{ uri: photoUri(booking.item.cover_photo) }}
                 style={styles.itemImage}
               />
             ) : (
@@ -15,13 +15,15 @@ import { Ionicons } from '@expo/vector-icons';
 import { useNavigation } from '@react-navigation/native';
 import { useAuth } from '../context/AuthContext';
 import axios from 'axios';
+import { photoUri } from '../utils/photos';
 
 interface Item {
   id: string;
   title: string;
   description: string;
   category: string;
-  photos: string[];
+  photos?: string[];
+  cover_photo?: string;
   price_per_day: number;
   price_per_hour?: number;
   location: { lat: number; lng: number };
@@ -112,9 +114,9 @@ export default function HomeScreen() {
       onPress={() => handleItemPress(item)}
     >
       <View style={styles.itemImageContainer}>
-        {item.photos && item.photos.length > 0 ? (
+        {item.cover_photo ? (
           <Image
-            source={{ uri: `data:image/jpeg;base64,${item.photos[0]}` }}
+            source={{ uri: photoUri(item.cover_photo) }}
             style={styles.itemImage}
           />
         ) : (
@@ -16,13 +16,15 @@ import { useNavigation, useRoute } from '@react-navigation/native';
 import { useAuth } from '../context/AuthContext';
 import DateTimePicker from 'react-native-modal-datetime-picker';
 import axios from 'axios';
+import { photoUri } from '../utils/photos';
 
 interface Item {
   id: string;
   title: string;
   description: string;
   category: string;
-  photos: string[];
+  photos?: string[];
+  cover_photo?: string;
   price_per_day: number;
   price_per_hour?: number;
   location: { lat: number; lng: number };
@@ -30,7 +32,6 @@ interface Item {
   rating: number;
   total_reviews: number;
   owner_id: string;
-  availability_calendar: string[];
   is_available: boolean;
 }
 
@@ -60,6 +61,8 @@ export default function ItemDetailsScreen() {
   const [loading, setLoading] = useState(false);
   const [reviews, setReviews] = useState<Review[]>([]);
   const [currentImageIndex, setCurrentImageIndex] = useState(0);
+  // List screens only pass the cover thumbnail, so load the full photo set here
+  const [photos, setPhotos] = useState<string[]>(item.photos || []);
 
   const isOwner = user?.id === item.owner_id;
 
@@ -106,8 +109,18 @@ export default function ItemDetailsScreen() {
     }
   };
 
+  const fetchPhotos = async () => {
+    try {
+      const response = await axios.get(`${API_URL}/api/items/${item.id}`);
+      setPhotos(response.data.photos || []);
+    } catch (error) {
+      console.error('Error fetching item photos:', error);
+    }
+  };
+
   React.useEffect(() => {
     fetchReviews();
+    fetchPhotos();
   }, []);
 
   const calculateTotal = () => {
@@ -143,11 +156,11 @@ export default function ItemDetailsScreen() {
         }}
         scrollEventThrottle={16}
       >
-        {item.photos && item.photos.length > 0 ? (
-          item.photos.map((photo, index) => (
+        {photos.length > 0 ? (
+          photos.map((photo, index) => (
             <Image
               key={index}
-              source={{ uri: `data:image/jpeg;base64,${photo}` }}
+              source={{ uri: photoUri(photo) }}
               style={styles.carouselImage}
             />
           ))
@@ -158,9 +171,9 @@ export default function ItemDetailsScreen() {
         )}
       </ScrollView>
 
-      {item.photos && item.photos.length > 1 && (
+      {photos.length > 1 && (
         <View style={styles.imageIndicators}>
-          {item.photos.map((_, index) => (
+          {photos.map((_, index) => (
             <View
               key={index}
               style={[
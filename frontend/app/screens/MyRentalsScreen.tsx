@@ -14,6 +14,7 @@ import { Ionicons } from '@expo/vector-icons';
 import { useNavigation } from '@react-navigation/native';
 import { useAuth } from '../context/AuthContext';
 import axios from 'axios';
+import { photoUri } from '../utils/photos';
 
 interface Booking {
   id: string;
@@ -33,15 +34,22 @@ interface Booking {
 interface Item {
   id: string;
   title: string;
-  description: string;
   category: string;
-  photos: string[];
+  address: string;
   price_per_day: number;
-  owner_id: string;
+  cover_photo?: string;
+}
+
+interface Counterparty {
+  id: string;
+  first_name: string;
+  last_name: string;
+  rating: number;
 }
 
 interface BookingWithItem extends Booking {
   item?: Item;
+  counterparty?: Counterparty;
   isOwner: boolean;
 }
 
@@ -61,27 +69,14 @@ export default function MyRentalsScreen() {
 
   const fetchBookings = async () => {
     try {
-      const response = await axios.get(`${API_URL}/api/bookings/my-bookings`);
-      const bookingsData = response.data;
-
-      // Fetch item details for each booking
-      const bookingsWithItems = await Promise.all(
-        bookingsData.map(async (booking: Booking) => {
-          try {
-            const itemResponse = await axios.get(`${API_URL}/api/items/${booking.item_id}`);
-            return {
-              ...booking,
-              item: itemResponse.data,
-              isOwner: booking.owner_id === user?.id,
-            };
-          } catch (error) {
-            return {
-              ...booking,
-              isOwner: booking.owner_id === user?.id,
-            };
-          }
-        })
-      );
+      // Item summaries are embedded by the server in the same response
+      const response = await axios.get(`${API_URL}/api/bookings/my-bookings`, {
+        params: { expand: 'item,counterparty' },
+      });
+      const bookingsWithItems = response.data.map((booking: Booking) => ({
+        ...booking,
+        isOwner: booking.owner_id === user?.id,
+      }));
 
       setBookings(bookingsWithItems);
     } catch (error) {
@@ -177,9 +172,9 @@ export default function MyRentalsScreen() {
     >
       <View style={styles.bookingHeader}>
         <View style={styles.itemInfo}>
-          {booking.item?.photos && booking.item.photos.length > 0 ? (
+          {booking.item?.cover_photo ? (
             <Image
-              source={{ uri: `data:image/jpeg;base64,${booking.item.photos[0]}` }}
+              source={{ uri: photoUri(booking.item.cover_photo) }}
               style={styles.itemImage}
             />
           ) : (
@@ -16,6 +16,7 @@ import { useNavigation } from '@react-navigation/native';
 import { useAuth } from '../context/AuthContext';
 import * as ImagePicker from 'expo-image-picker';
 import axios from 'axios';
+import { photoUri } from '../utils/photos';
 
 const API_URL = process.env.EXPO_PUBLIC_BACKEND_URL;
 
@@ -218,7 +219,7 @@ export default function ProfileScreen() {
           >
             {user?.profile_photo ? (
               <Image
-                source={{ uri: `data:image/jpeg;base64,${user.profile_photo}` }}
+                source={{ uri: photoUri(user.profile_photo) }}
                 style={styles.profileImage}
               />
             ) : (
@@ -14,13 +14,15 @@ import {
 import { Ionicons } from '@expo/vector-icons';
 import { useNavigation, useRoute } from '@react-navigation/native';
 import axios from 'axios';
+import { photoUri } from '../utils/photos';
 
 interface Item {
   id: string;
   title: string;
   description: string;
   category: string;
-  photos: string[];
+  photos?: string[];
+  cover_photo?: string;
   price_per_day: number;
   price_per_hour?: number;
   location: { lat: number; lng: number };
@@ -106,9 +108,9 @@ export default function SearchScreen() {
       onPress={() => handleItemPress(item)}
     >
       <View style={styles.itemImageContainer}>
-        {item.photos && item.photos.length > 0 ? (
+        {item.cover_photo ? (
           <Image
-            source={{ uri: `data:image/jpeg;base64,${item.photos[0]}` }}
+            source={{ uri: photoUri(item.cover_photo) }}
             style={styles.itemImage}
           />
         ) : (
@@ -0,0 +1,11 @@
+const API_URL = process.env.EXPO_PUBLIC_BACKEND_URL;
+
+const PHOTO_URL_PREFIX = '/api/photos/';
+
+// Photos come back as "/api/photos/<hash>" references; freshly picked ones are still base64
+export function photoUri(photo: string): string {
+  if (photo.startsWith(PHOTO_URL_PREFIX)) {
+    return `${API_URL}${photo}`;
+  }
+  return `data:image/jpeg;base64,${photo}`;
+}
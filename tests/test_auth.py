@@ -0,0 +1,43 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+@pytest.fixture(autouse=True)
+def memory_repositories(monkeypatch):
+    monkeypatch.setattr(server, "repos", server.build_repositories("memory"))
+
+def register_concurrently(*emails: str) -> list:
+    async def send():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/api/auth/register", json={
+                    "email": email, "password": "correct horse", "first_name": "Ada", "last_name": "Lovelace",
+                })
+                for email in emails
+            ))
+    return asyncio.run(send())
+
+def test_concurrent_registrations_with_one_email():
+    # Both pass the existence check while their passwords hash; the insert decides
+    responses = register_concurrently("ada@example.com", "ada@example.com")
+    assert sorted(response.status_code for response in responses) == [200, 400]
+    assert [response.json()["detail"] for response in responses if response.status_code == 400] == [
+        "Email already registered"
+    ]
+
+def test_registering_a_taken_email():
+    assert register_concurrently("grace@example.com")[0].status_code == 200
+    response = register_concurrently("grace@example.com")[0]
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email already registered"
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import random
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+import pytest
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from server import AvailabilityCalendar, month_ranges  # noqa: E402
+
+def days(first: date, count: int) -> set:
+    return {first + timedelta(days=offset) for offset in range(count)}
+
+def blocked_days(calendar: AvailabilityCalendar, start: date, end: date) -> set:
+    return {day for day in days(start, (end - start).days) if calendar.is_blocked(day)}
+
+def test_empty_calendar_blocks_nothing():
+    calendar = AvailabilityCalendar()
+    assert not calendar.is_blocked(date(2030, 5, 1))
+    assert calendar.is_range_free(date(2030, 5, 1), date(2030, 6, 1))
+    assert calendar.to_document() is None
+
+def test_set_range_end_is_exclusive():
+    calendar = AvailabilityCalendar()
+    calendar.set_range(date(2030, 5, 10), date(2030, 5, 13))
+    assert blocked_days(calendar, date(2030, 5, 1), date(2030, 6, 1)) == days(date(2030, 5, 10), 3)
+    assert calendar.is_range_free(date(2030, 5, 13), date(2030, 5, 20))
+    assert not calendar.is_range_free(date(2030, 5, 12), date(2030, 5, 14))
+
+def test_range_before_origin_prepends_whole_bytes():
+    calendar = AvailabilityCalendar()
+    calendar.set_range(date(2030, 5, 10), date(2030, 5, 12))
+    origin, length = calendar.origin, len(calendar.bits)
+    calendar.set_range(date(2029, 12, 30), date(2030, 1, 2))
+    assert calendar.origin < origin
+    assert (origin - calendar.origin).days % 8 == 0
+    assert len(calendar.bits) == length + (origin - calendar.origin).days // 8
+    expected = days(date(2029, 12, 30), 3) | days(date(2030, 5, 10), 2)
+    assert blocked_days(calendar, date(2029, 12, 1), date(2030, 6, 1)) == expected
+
+def test_unblocking_clears_only_the_range():
+    calendar = AvailabilityCalendar()
+    calendar.set_range(date(2030, 5, 1), date(2030, 5, 21))
+    calendar.set_range(date(2030, 5, 5), date(2030, 5, 10), blocked=False)
+    expected = days(date(2030, 5, 1), 4) | days(date(2030, 5, 10), 11)
+    assert blocked_days(calendar, date(2030, 4, 1), date(2030, 6, 1)) == expected
+    # Outside the stored bits, and on an empty calendar, unblocking is a no-op
+    calendar.set_range(date(2031, 1, 1), date(2031, 2, 1), blocked=False)
+    AvailabilityCalendar().set_range(date(2030, 1, 1), date(2030, 2, 1), blocked=False)
+    assert blocked_days(calendar, date(2030, 4, 1), date(2030, 6, 1)) == expected
+
+def test_unblocking_everything_drops_the_document():
+    calendar = AvailabilityCalendar()
+    calendar.set_range(date(2030, 5, 1), date(2030, 5, 4))
+    calendar.set_range(date(2030, 5, 1), date(2030, 5, 4), blocked=False)
+    assert calendar.to_document() is None
+
+def test_trim_drops_past_bytes_and_trailing_zeros():
+    calendar = AvailabilityCalendar()
+    calendar.set_range(date(2030, 1, 3), date(2030, 1, 5))
+    calendar.set_range(date(2030, 3, 1), date(2030, 3, 3))
+    calendar.set_range(date(2030, 12, 20), date(2030, 12, 22))
+    calendar.set_range(date(2030, 12, 20), date(2030, 12, 22), blocked=False)
+    calendar.trim(before=date(2030, 2, 20))
+    assert calendar.origin <= date(2030, 2, 20)
+    assert (date(2030, 2, 20) - calendar.origin).days < 8
+    assert calendar.bits[-1]
+    assert blocked_days(calendar, date(2030, 2, 20), date(2031, 1, 1)) == days(date(2030, 3, 1), 2)
+
+def test_trim_past_the_end_empties_the_calendar():
+    calendar = AvailabilityCalendar()
+    calendar.set_range(date(2030, 1, 3), date(2030, 1, 5))
+    calendar.trim(before=date(2031, 1, 1))
+    assert not calendar.bits
+    assert calendar.to_document() is None
+
+def test_document_round_trip():
+    calendar = AvailabilityCalendar()
+    calendar.set_range(date(2030, 5, 10), date(2030, 5, 13))
+    restored = AvailabilityCalendar.from_document(calendar.to_document())
+    assert restored.origin == calendar.origin
+    assert restored.bits == calendar.bits
+
+def test_blocked_ranges_merge_blocked_and_booked_days():
+    calendar = AvailabilityCalendar()
+    calendar.set_range(date(2030, 5, 3), date(2030, 5, 5))
+    booked = {date(2030, 5, 5), date(2030, 5, 6), date(2030, 5, 9)}
+    ranges = calendar.blocked_ranges(date(2030, 5, 1), date(2030, 5, 10), booked)
+    assert ranges == [(date(2030, 5, 3), date(2030, 5, 6)), (date(2030, 5, 9), date(2030, 5, 9))]
+
+def test_blocked_ranges_stop_at_the_window_end():
+    calendar = AvailabilityCalendar()
+    calendar.set_range(date(2030, 5, 28), date(2030, 6, 5))
+    assert calendar.blocked_ranges(date(2030, 5, 1), date(2030, 6, 1)) == [(date(2030, 5, 28), date(2030, 5, 31))]
+
+def test_month_ranges_split_at_month_ends():
+    months = month_ranges([(date(2030, 1, 30), date(2030, 3, 2)), (date(2030, 3, 10), date(2030, 3, 10))])
+    assert months == {
+        "2030-01": [{"start": "2030-01-30", "end": "2030-01-31"}],
+        "2030-02": [{"start": "2030-02-01", "end": "2030-02-28"}],
+        "2030-03": [{"start": "2030-03-01", "end": "2030-03-02"}, {"start": "2030-03-10", "end": "2030-03-10"}],
+    }
+
+def test_month_ranges_cross_the_year_end():
+    months = month_ranges([(date(2030, 12, 31), date(2031, 1, 1))])
+    assert list(months) == ["2030-12", "2031-01"]
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_a_set_of_days(seed):
+    rng = random.Random(seed)
+    base = date(2030, 6, 15)
+    calendar, model = AvailabilityCalendar(), set()
+    horizon = base - timedelta(days=200)
+    for _ in range(60):
+        action = rng.random()
+        start = base + timedelta(days=rng.randint(-200, 400))
+        end = start + timedelta(days=rng.randint(0, 40))
+        if action < 0.5:
+            calendar.set_range(start, end)
+            model |= days(start, (end - start).days)
+        elif action < 0.85:
+            calendar.set_range(start, end, blocked=False)
+            model -= days(start, (end - start).days)
+        else:
+            # Days before a trim point are never queried again
+            horizon = max(horizon, start)
+            calendar.trim(before=start)
+        calendar = AvailabilityCalendar.from_document(calendar.to_document())
+        window_end = base + timedelta(days=450)
+        expected = {day for day in model if horizon <= day < window_end}
+        assert blocked_days(calendar, horizon, window_end) == expected
+
+# PUT /api/items/{id}/availability
+@pytest.fixture
+def owned_item(monkeypatch):
+    monkeypatch.setattr(server, "repos", server.build_repositories("memory"))
+    server.app.dependency_overrides[server.active_user_id] = lambda: "owner"
+    item = server.Item(
+        owner_id="owner",
+        title="Ladder",
+        description="Availability fixture",
+        category=server.ItemCategory.TOOLS,
+        price_per_day=8,
+        location={"lat": 41.0, "lng": 29.0},
+        address="Workshop",
+    )
+    asyncio.run(server.repos.items.insert(server.item_to_document(item)))
+    yield item.id
+    server.app.dependency_overrides.clear()
+
+def block(item_id: str, start: date, end: date) -> httpx.Response:
+    async def send():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.put(f"/api/items/{item_id}/availability", json={
+                "start_date": start.isoformat(), "end_date": end.isoformat(),
+            })
+    return asyncio.run(send())
+
+def stored_calendar(item_id: str) -> AvailabilityCalendar:
+    item_doc = asyncio.run(server.repos.items.get(item_id, ["availability"]))
+    return AvailabilityCalendar.from_document(item_doc.get("availability"))
+
+def test_update_retries_after_a_concurrent_edit(owned_item, monkeypatch):
+    update = server.repos.items.update
+    calls = []
+
+    async def racing_update(item_id, changes, expected=None):
+        calls.append(expected)
+        if len(calls) == 1:
+            # Another request lands between this one's read and its write
+            concurrent = AvailabilityCalendar()
+            concurrent.set_range(date(2031, 7, 1), date(2031, 7, 3))
+            await update(item_id, {"availability": concurrent.to_document()})
+        return await update(item_id, changes, expected)
+
+    monkeypatch.setattr(server.repos.items, "update", racing_update)
+    assert block(owned_item, date(2031, 8, 1), date(2031, 8, 4)).status_code == 200
+    assert len(calls) == 2
+    expected = days(date(2031, 7, 1), 2) | days(date(2031, 8, 1), 3)
+    assert blocked_days(stored_calendar(owned_item), date(2031, 6, 1), date(2031, 9, 1)) == expected
+
+def test_update_gives_up_after_repeated_conflicts(owned_item, monkeypatch):
+    async def always_stale(item_id, changes, expected=None):
+        return False
+
+    monkeypatch.setattr(server.repos.items, "update", always_stale)
+    assert block(owned_item, date(2031, 8, 1), date(2031, 8, 4)).status_code == 409
+
+def test_update_rejects_empty_range(owned_item):
+    assert block(owned_item, date(2031, 8, 4), date(2031, 8, 4)).status_code == 400
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+import pytest
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+FIRST_DAY = datetime(2031, 3, 2, 10, 0)
+
+@pytest.fixture(autouse=True)
+def memory_repositories(monkeypatch):
+    monkeypatch.setattr(server, "repos", server.build_repositories("memory"))
+    yield
+    server.app.dependency_overrides.clear()
+
+@pytest.fixture
+def item_id():
+    item = server.Item(
+        owner_id="owner",
+        title="Kayak",
+        description="Booking fixture",
+        category=server.ItemCategory.SPORTS,
+        price_per_day=30,
+        location={"lat": 41.0, "lng": 29.0},
+        address="Harbour",
+    )
+    asyncio.run(server.repos.items.insert(server.item_to_document(item)))
+    return item.id
+
+def request(user_id: str, method: str, path: str, **kwargs) -> httpx.Response:
+    server.app.dependency_overrides[server.active_user_id] = lambda: user_id
+
+    async def send():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, path, **kwargs)
+    return asyncio.run(send())
+
+def book(renter_id: str, item_id: str, first_night: int, hand_back: int) -> httpx.Response:
+    return request(renter_id, "POST", "/api/bookings", json={
+        "item_id": item_id,
+        "start_date": (FIRST_DAY + timedelta(days=first_night)).isoformat(),
+        "end_date": (FIRST_DAY + timedelta(days=hand_back)).isoformat(),
+    })
+
+def set_status(user_id: str, booking_id: str, status: str) -> httpx.Response:
+    return request(user_id, "PUT", f"/api/bookings/{booking_id}/status", json={"status": status})
+
+def test_overlapping_booking_is_rejected(item_id):
+    assert book("alice", item_id, 0, 4).status_code == 200
+    assert book("bob", item_id, 1, 3).status_code == 409
+    assert book("bob", item_id, 3, 6).status_code == 409
+
+def test_partial_overlap_claims_none_of_its_free_nights(item_id):
+    assert book("alice", item_id, 5, 7).status_code == 200
+    # Nights 3 and 4 are free, night 5 is taken
+    assert book("bob", item_id, 3, 6).status_code == 409
+    assert book("carol", item_id, 3, 5).status_code == 200
+
+def test_hand_back_day_stays_bookable(item_id):
+    assert book("alice", item_id, 0, 3).status_code == 200
+    assert book("bob", item_id, 3, 5).status_code == 200
+    assert book("carol", item_id, -2, 0).status_code == 200
+
+def test_rejected_booking_releases_its_dates(item_id):
+    booking = book("alice", item_id, 0, 3)
+    assert booking.status_code == 200
+    assert set_status("owner", booking.json()["id"], "rejected").status_code == 200
+    assert book("bob", item_id, 1, 2).status_code == 200
+
+def test_rejected_booking_cannot_be_reopened(item_id):
+    booking_id = book("alice", item_id, 0, 3).json()["id"]
+    assert set_status("owner", booking_id, "rejected").status_code == 200
+    assert book("bob", item_id, 0, 3).status_code == 200
+    assert set_status("owner", booking_id, "approved").status_code == 409
+    assert set_status("alice", booking_id, "completed").status_code == 409
+    assert asyncio.run(server.repos.bookings.get(booking_id))["status"] == "rejected"
+
+def test_only_the_owner_approves(item_id):
+    booking_id = book("alice", item_id, 0, 3).json()["id"]
+    assert set_status("alice", booking_id, "approved").status_code == 403
+    assert set_status("owner", booking_id, "approved").status_code == 200
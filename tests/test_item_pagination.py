@@ -0,0 +1,91 @@
+import asyncio
+import base64
+import json
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+@pytest.fixture(autouse=True)
+def memory_repositories(monkeypatch):
+    monkeypatch.setattr(server, "repos", server.build_repositories("memory"))
+    server.invalidate_item_queries()
+    yield
+    server.invalidate_item_queries()
+
+def add_items(locations):
+    async def insert():
+        for lat, lng in locations:
+            item = server.Item(
+                owner_id="owner",
+                title="Drill",
+                description="Pagination fixture",
+                category=server.ItemCategory.TOOLS,
+                price_per_day=10,
+                location={"lat": lat, "lng": lng},
+                address="Same street",
+            )
+            await server.repos.items.insert(server.item_to_document(item))
+    asyncio.run(insert())
+
+def request(path: str, **params) -> httpx.Response:
+    async def send():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path, params=params)
+    return asyncio.run(send())
+
+def walk_pages(limit: int, **params) -> list:
+    ids, cursor = [], None
+    for _ in range(50):
+        response = request("/api/items", limit=limit, **params, **({"cursor": cursor} if cursor else {}))
+        assert response.status_code == 200, response.text
+        ids += [item["id"] for item in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return ids
+    pytest.fail("pagination did not terminate")
+
+def cursor_for(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+def test_geo_pages_through_tie_group_longer_than_page():
+    add_items([(41.0, 29.0)] * 12)
+    ids = walk_pages(5, lat=41, lng=29)
+    assert len(ids) == 12
+    assert len(set(ids)) == 12
+
+def test_geo_pages_through_several_tie_groups():
+    add_items([(41.0, 29.0)] * 9 + [(41.01, 29.0)] * 7 + [(41.02, 29.0)] * 7)
+    ids = walk_pages(5, lat=41, lng=29)
+    assert len(ids) == 23
+    assert len(set(ids)) == 23
+
+def test_newest_pages_cover_every_item_once():
+    add_items([(41.0, 29.0)] * 11)
+    ids = walk_pages(4)
+    assert len(ids) == 11
+    assert len(set(ids)) == 11
+
+@pytest.mark.parametrize("params", [{"limit": 0}, {"limit": 101}, {"skip": -1}, {"limit": 0, "lat": 41, "lng": 29}])
+def test_out_of_range_paging_is_rejected(params):
+    assert request("/api/items", **params).status_code == 422
+
+@pytest.mark.parametrize("params", [
+    {"cursor": cursor_for({"sort": "newest", "value": "notadate", "id": "x"})},
+    {"cursor": cursor_for({"sort": "newest", "value": "2024-01-01T00:00:00", "id": 5})},
+    {"cursor": cursor_for({"sort": "rating", "value": "high", "id": "x"}), "sort": "rating"},
+    {"cursor": cursor_for({"sort": "distance", "distance_km": "far"}), "lat": 41, "lng": 29},
+    {"cursor": cursor_for({"sort": "distance", "distance_km": 1.5, "seen": [1, 2]}), "lat": 41, "lng": 29},
+    {"cursor": "not-a-cursor"},
+])
+def test_malformed_cursor_is_rejected(params):
+    assert request("/api/items", **params).status_code == 400
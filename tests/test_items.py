@@ -0,0 +1,40 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+@pytest.fixture(autouse=True)
+def memory_repositories(monkeypatch):
+    monkeypatch.setattr(server, "repos", server.build_repositories("memory"))
+
+@pytest.mark.parametrize("location", [
+    {"lat": 91, "lng": 29},
+    {"lat": 41, "lng": -180.5},
+    {"lat": "NaN", "lng": 29},
+    {"lat": 41, "lng": "Infinity"},
+])
+def test_create_item_rejects_unindexable_location(location, monkeypatch):
+    monkeypatch.setitem(server.app.dependency_overrides, server.active_user_id, lambda: "owner")
+
+    async def send():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/items", json={
+                "title": "Drill",
+                "description": "Out of range",
+                "category": "tools",
+                "price_per_day": 10,
+                "location": location,
+                "address": "Nowhere",
+            })
+    assert asyncio.run(send()).status_code == 400
+    assert not asyncio.run(server.repos.items.list_by_owner("owner"))
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+@pytest.fixture(autouse=True)
+def memory_repositories(monkeypatch):
+    monkeypatch.setattr(server, "repos", server.build_repositories("memory"))
+
+def legacy_item(item_id: str, rating: float, total_reviews: int) -> dict:
+    # Shape written before rating_sum/rating_count existed
+    return {
+        "id": item_id,
+        "owner_id": "owner",
+        "title": "Tent",
+        "description": "Legacy listing",
+        "category": "camping",
+        "photos": [],
+        "price_per_day": 20.0,
+        "location": server.to_geojson_point({"lat": 41.0, "lng": 29.0}),
+        "address": "Old street",
+        "is_available": True,
+        "rating": rating,
+        "total_reviews": total_reviews,
+        "created_at": datetime(2023, 1, 1),
+        "updated_at": datetime(2023, 1, 1),
+    }
+
+def test_first_review_on_legacy_item_keeps_its_history():
+    async def run():
+        await server.repos.items.insert(legacy_item("legacy", 4.5, 200))
+        await server.repos.items.add_rating("legacy", 1)
+        return await server.repos.items.get("legacy")
+    item = asyncio.run(run())
+    assert item["rating_sum"] == 4.5 * 200 + 1
+    assert item["rating_count"] == 201
+    assert item["total_reviews"] == 201
+    assert item["rating"] == pytest.approx((4.5 * 200 + 1) / 201)
+    assert item["updated_at"] > datetime(2023, 1, 1)
+
+def test_first_review_on_legacy_user_keeps_its_history():
+    async def run():
+        await server.repos.users.insert({
+            "id": "old-user", "email": "old@example.com", "first_name": "Old", "last_name": "User",
+            "rating": 3.0, "total_reviews": 4,
+        })
+        await server.repos.users.add_rating("old-user", 5)
+        return await server.repos.users.get("old-user")
+    user = asyncio.run(run())
+    assert (user["rating_sum"], user["rating_count"]) == (17, 5)
+    assert user["rating"] == pytest.approx(3.4)
+
+def test_unrated_document_starts_from_zero():
+    async def run():
+        await server.repos.items.insert(legacy_item("fresh", 0.0, 0))
+        await server.repos.items.add_rating("fresh", 4)
+        await server.repos.items.add_rating("fresh", 5)
+        return await server.repos.items.get("fresh")
+    item = asyncio.run(run())
+    assert (item["rating_sum"], item["rating_count"], item["rating"]) == (9, 2, 4.5)
+
+def test_legacy_totals_count_towards_popularity():
+    async def run():
+        await server.repos.items.insert(legacy_item("veteran", 4.8, 300))
+        await server.repos.items.insert(legacy_item("newcomer", 5.0, 1))
+        await server.repos.items.insert(legacy_item("dud", 2.0, 300))
+        return await server.repos.items.popular_feeds(10, prior_weight=5)
+    feeds = asyncio.run(run())
+    assert [item["id"] for item in feeds[server.POPULAR_ALL]] == ["veteran", "newcomer", "dud"]